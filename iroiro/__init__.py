@@ -9,50 +9,49 @@ check_python_version()
 del check_python_version
 
 
-def load_internal_modules(prefix, post_load_hook):
-    import importlib
-    import pkgutil
-    scope_prefix = __name__ + '.'
-    for mod_info in pkgutil.iter_modules(__path__, scope_prefix):
-        mod_name = mod_info.name[len(scope_prefix):]
-        if not mod_name.startswith(prefix):
-            continue
+# Sub-modules are loaded on first access, see scripts/gen_exports.py
+from .internal_exports import lib_modules as _lib_modules
+from .internal_exports import exports as _exports
+
+from . import bin
 
-        module = importlib.import_module(mod_info.name)
-        post_load_hook(module, mod_name)
+__all__ = ['bin'] + list(_lib_modules) + list(_exports)
 
 
-def post_load_lib(module, mod_name):
-    ext_name = mod_name[4:]
+def _cleanup_namespace():
+    # Delete old names from package namespace, the import system sets them
+    for name in [name for name in globals() if name.startswith(('lib_', 'bin_'))]:
+        del globals()[name]
 
-    if '__all__' in module.__dict__:
-        attrs = module.__dict__['__all__']
-    else:
-        attrs = [x for x in module.__dict__ if not x.startswith('_')]
+
+def _load_lib(ext_name):
+    import importlib
+    module = importlib.import_module(__name__ + '.lib_' + ext_name)
 
     # Register module into package namespace with external name
     globals()[ext_name] = module
-    globals().update({attr: getattr(module, attr) for attr in attrs})
+    globals().update({attr: getattr(module, attr)
+                      for attr in module.__all__
+                      if _exports.get(attr) == ext_name})
 
-    # Delete old name from package namespace
-    del globals()[mod_name]
+    _cleanup_namespace()
 
+    return module
 
-def post_load_bin(module, mod_name):
-    ext_name = mod_name[4:]
 
-    # Register module into iroiro.bin with external name
-    setattr(bin, ext_name, module)
+def __getattr__(name):
+    if name in _lib_modules:
+        return _load_lib(name)
 
-    # Delete old name from package namespace
-    del globals()[mod_name]
+    if name in _exports:
+        _load_lib(_exports[name])
+        return globals()[name]
 
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
-from . import bin
 
-load_internal_modules('lib_', post_load_lib)
-load_internal_modules('bin_', post_load_bin)
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
-del post_load_lib
-del post_load_bin
-del load_internal_modules
+_cleanup_namespace()
@@ -1,2 +1,22 @@
 # This file is a placeholder for iroiro.bin module
-# The actual sub-modules will be loaded in iroiro.__init__.py
+# The actual sub-modules are loaded on first access
+
+from ..internal_exports import bin_modules as _bin_modules
+
+
+def __getattr__(name):
+    if name not in _bin_modules:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+    import importlib
+    module = importlib.import_module('iroiro.bin_' + name)
+    globals()[name] = module
+
+    from .. import _cleanup_namespace
+    _cleanup_namespace()
+
+    return module
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_bin_modules))
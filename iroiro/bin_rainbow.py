@@ -112,6 +112,7 @@ def spell_suggestion_err_msg(word):
 class Inventory:
     def __init__(self):
         self.data = []
+        self.lookup = {}
 
     def __bool__(self):
         return bool(self.data)
@@ -124,9 +125,7 @@ class Inventory:
 
     def __getitem__(self, idx):
         if isinstance(idx, Color):
-            for item in self.data:
-                if item[0] == idx:
-                    return item
+            return self.lookup.get(idx)
         else:
             return self.data[idx]
 
@@ -152,6 +151,7 @@ class Inventory:
 
         item = (color, [])
         self.data.append(item)
+        self.lookup.setdefault(color, item)
         for n in namelist:
             if n and n not in item[1]:
                 item[1].append(n)
@@ -194,6 +194,7 @@ class Inventory:
 
         tmp = self.data
         self.data = []
+        self.lookup = {}
         for clr, name_list in tmp:
             for name in name_list:
                 for keyword in keywords:
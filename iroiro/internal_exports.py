@@ -0,0 +1,310 @@
+# Generated by scripts/gen_exports.py, do not edit
+
+lib_modules = (
+        'colors',
+        'fs',
+        'itertools',
+        'math',
+        'regex',
+        'sh',
+        'subproc',
+        'test_utils',
+        'tui',
+        )
+
+bin_modules = (
+        'iroiro',
+        'ntfy',
+        'palette',
+        'rainbow',
+        'sponge',
+        )
+
+# {attr: lib module}
+exports = {
+        'get_color_depth': 'colors',
+        'set_color_depth': 'colors',
+        'color_depth': 'colors',
+        'detect_color_depth': 'colors',
+        'NoColor': 'colors',
+        'Emphasis': 'colors',
+        'bold': 'colors',
+        'lowint': 'colors',
+        'underline': 'colors',
+        'blink': 'colors',
+        'reverse': 'colors',
+        'invisible': 'colors',
+        'Color': 'colors',
+        'color': 'colors',
+        'Color8': 'colors',
+        'Color256': 'colors',
+        'ColorRGB': 'colors',
+        'ColorHSV': 'colors',
+        'rgb_to_hsv': 'colors',
+        'hsv_to_rgb': 'colors',
+        'color256_to_rgb': 'colors',
+        'rgb_to_color256': 'colors',
+        'ColorCompound': 'colors',
+        'paint': 'colors',
+        'nocolor': 'colors',
+        'names': 'colors',
+        'black': 'colors',
+        'maroon': 'colors',
+        'green': 'colors',
+        'olive': 'colors',
+        'navy': 'colors',
+        'purple': 'colors',
+        'teal': 'colors',
+        'silver': 'colors',
+        'gray': 'colors',
+        'grey': 'colors',
+        'red': 'colors',
+        'lime': 'colors',
+        'yellow': 'colors',
+        'blue': 'colors',
+        'fuchsia': 'colors',
+        'magenta': 'colors',
+        'aqua': 'colors',
+        'cyan': 'colors',
+        'white': 'colors',
+        'murasaki': 'colors',
+        'aliceblue': 'colors',
+        'antiquewhite': 'colors',
+        'aquamarine': 'colors',
+        'azure': 'colors',
+        'beige': 'colors',
+        'bisque': 'colors',
+        'blanchedalmond': 'colors',
+        'blueviolet': 'colors',
+        'brown': 'colors',
+        'burlywood': 'colors',
+        'cadetblue': 'colors',
+        'chartreuse': 'colors',
+        'chocolate': 'colors',
+        'clementine': 'colors',
+        'coral': 'colors',
+        'cornflowerblue': 'colors',
+        'cornsilk': 'colors',
+        'crimson': 'colors',
+        'darkblue': 'colors',
+        'darkcyan': 'colors',
+        'darkgoldenrod': 'colors',
+        'darkgray': 'colors',
+        'darkgreen': 'colors',
+        'darkgrey': 'colors',
+        'darkkhaki': 'colors',
+        'darkmagenta': 'colors',
+        'darkolivegreen': 'colors',
+        'darkorange': 'colors',
+        'darkorchid': 'colors',
+        'darkred': 'colors',
+        'darksalmon': 'colors',
+        'darkseagreen': 'colors',
+        'darkslateblue': 'colors',
+        'darkslategray': 'colors',
+        'darkslategrey': 'colors',
+        'darkturquoise': 'colors',
+        'darkviolet': 'colors',
+        'deeppink': 'colors',
+        'deepskyblue': 'colors',
+        'dimgray': 'colors',
+        'dimgrey': 'colors',
+        'dodgerblue': 'colors',
+        'firebrick': 'colors',
+        'floralwhite': 'colors',
+        'forestgreen': 'colors',
+        'gainsboro': 'colors',
+        'ghostwhite': 'colors',
+        'gold': 'colors',
+        'goldenrod': 'colors',
+        'greenyellow': 'colors',
+        'honeydew': 'colors',
+        'hotpink': 'colors',
+        'indianred': 'colors',
+        'indigo': 'colors',
+        'ivory': 'colors',
+        'khaki': 'colors',
+        'lavender': 'colors',
+        'lavenderblush': 'colors',
+        'lawngreen': 'colors',
+        'lemonchiffon': 'colors',
+        'lightblue': 'colors',
+        'lightcoral': 'colors',
+        'lightcyan': 'colors',
+        'lightgoldenrodyellow': 'colors',
+        'lightgray': 'colors',
+        'lightgreen': 'colors',
+        'lightgrey': 'colors',
+        'lightpink': 'colors',
+        'lightsalmon': 'colors',
+        'lightseagreen': 'colors',
+        'lightskyblue': 'colors',
+        'lightslategray': 'colors',
+        'lightslategrey': 'colors',
+        'lightsteelblue': 'colors',
+        'lightyellow': 'colors',
+        'limegreen': 'colors',
+        'linen': 'colors',
+        'mediumaquamarine': 'colors',
+        'mediumblue': 'colors',
+        'mediumorchid': 'colors',
+        'mediumpurple': 'colors',
+        'mediumseagreen': 'colors',
+        'mediumslateblue': 'colors',
+        'mediumspringgreen': 'colors',
+        'mediumturquoise': 'colors',
+        'mediumvioletred': 'colors',
+        'midnightblue': 'colors',
+        'mintcream': 'colors',
+        'mistyrose': 'colors',
+        'moccasin': 'colors',
+        'navajowhite': 'colors',
+        'oldlace': 'colors',
+        'olivedrab': 'colors',
+        'orange': 'colors',
+        'orangered': 'colors',
+        'orchid': 'colors',
+        'palegoldenrod': 'colors',
+        'palegreen': 'colors',
+        'paleturquoise': 'colors',
+        'palevioletred': 'colors',
+        'papayawhip': 'colors',
+        'peachpuff': 'colors',
+        'peru': 'colors',
+        'pink': 'colors',
+        'plum': 'colors',
+        'powderblue': 'colors',
+        'rosybrown': 'colors',
+        'royalblue': 'colors',
+        'saddlebrown': 'colors',
+        'salmon': 'colors',
+        'sandybrown': 'colors',
+        'seagreen': 'colors',
+        'seashell': 'colors',
+        'sienna': 'colors',
+        'skyblue': 'colors',
+        'slateblue': 'colors',
+        'slategray': 'colors',
+        'slategrey': 'colors',
+        'snow': 'colors',
+        'springgreen': 'colors',
+        'steelblue': 'colors',
+        'tan': 'colors',
+        'thistle': 'colors',
+        'tomato': 'colors',
+        'turquoise': 'colors',
+        'violet': 'colors',
+        'wheat': 'colors',
+        'whitesmoke': 'colors',
+        'yellowgreen': 'colors',
+        'decolor': 'colors',
+        'decolor_stream': 'colors',
+        'segments': 'colors',
+        'gradient': 'colors',
+        'open': 'fs',
+        'natsorted': 'fs',
+        'is_iterable': 'itertools',
+        'unwrap_one': 'itertools',
+        'unwrap': 'itertools',
+        'flatten': 'itertools',
+        'lookahead': 'itertools',
+        'zip_longest': 'itertools',
+        'is_uint8': 'math',
+        'sgn': 'math',
+        'lerp': 'math',
+        'clamp': 'math',
+        'vector': 'math',
+        'interval': 'math',
+        'resample': 'math',
+        'rere': 'regex',
+        'cwd': 'sh',
+        'pushd': 'sh',
+        'popd': 'sh',
+        'dirs': 'sh',
+        'home': 'sh',
+        'shrinkuser': 'sh',
+        'AlreadyRunningError': 'subproc',
+        'IOEngine': 'subproc',
+        'command': 'subproc',
+        'run': 'subproc',
+        'arun': 'subproc',
+        'pipe': 'subproc',
+        'is_parant_process_alive': 'subproc',
+        'is_parant_process_dead': 'subproc',
+        'children': 'subproc',
+        'terminate_self': 'subproc',
+        'terminate_children': 'subproc',
+        'monitor_parant_process': 'subproc',
+        'Checkpoint': 'test_utils',
+        'TestCase': 'test_utils',
+        'RunMocker': 'test_utils',
+        'FakeTerminal': 'test_utils',
+        'charwidth': 'tui',
+        'strwidth': 'tui',
+        'wrap': 'tui',
+        'Table': 'tui',
+        'ljust': 'tui',
+        'rjust': 'tui',
+        'ThreadedSpinner': 'tui',
+        'SpinnerAnimator': 'tui',
+        'AsyncSpinner': 'tui',
+        'ProgressBar': 'tui',
+        'prompt': 'tui',
+        'KEY_ESCAPE': 'tui',
+        'KEY_BACKSPACE': 'tui',
+        'KEY_TAB': 'tui',
+        'KEY_ENTER': 'tui',
+        'KEY_SPACE': 'tui',
+        'KEY_UP': 'tui',
+        'KEY_DOWN': 'tui',
+        'KEY_RIGHT': 'tui',
+        'KEY_LEFT': 'tui',
+        'KEY_HOME': 'tui',
+        'KEY_END': 'tui',
+        'KEY_PGUP': 'tui',
+        'KEY_PGDN': 'tui',
+        'KEY_F1': 'tui',
+        'KEY_F2': 'tui',
+        'KEY_F3': 'tui',
+        'KEY_F4': 'tui',
+        'KEY_F5': 'tui',
+        'KEY_F6': 'tui',
+        'KEY_F7': 'tui',
+        'KEY_F8': 'tui',
+        'KEY_F9': 'tui',
+        'KEY_F10': 'tui',
+        'KEY_F11': 'tui',
+        'KEY_F12': 'tui',
+        'KEY_PASTE_START': 'tui',
+        'KEY_PASTE_END': 'tui',
+        'KEY_CTRL_A': 'tui',
+        'KEY_CTRL_B': 'tui',
+        'KEY_CTRL_C': 'tui',
+        'KEY_CTRL_D': 'tui',
+        'KEY_CTRL_E': 'tui',
+        'KEY_CTRL_F': 'tui',
+        'KEY_CTRL_G': 'tui',
+        'KEY_CTRL_H': 'tui',
+        'KEY_CTRL_J': 'tui',
+        'KEY_CTRL_K': 'tui',
+        'KEY_CTRL_L': 'tui',
+        'KEY_CTRL_N': 'tui',
+        'KEY_CTRL_O': 'tui',
+        'KEY_CTRL_P': 'tui',
+        'KEY_CTRL_Q': 'tui',
+        'KEY_CTRL_R': 'tui',
+        'KEY_CTRL_S': 'tui',
+        'KEY_CTRL_T': 'tui',
+        'KEY_CTRL_U': 'tui',
+        'KEY_CTRL_V': 'tui',
+        'KEY_CTRL_W': 'tui',
+        'KEY_CTRL_X': 'tui',
+        'KEY_CTRL_Y': 'tui',
+        'KEY_CTRL_Z': 'tui',
+        'register_key': 'tui',
+        'deregister_key': 'tui',
+        'getch': 'tui',
+        'Paste': 'tui',
+        'KeyReader': 'tui',
+        'PseudoCanvas': 'tui',
+        }
@@ -1,6 +1,9 @@
+import io
 import re
 import abc
+import functools
 import itertools
+import contextvars
 
 from .lib_math import sgn
 from .lib_math import vector
@@ -14,14 +17,102 @@ from .internal_utils import exporter
 export, __all__ = exporter()
 
 
-def _apply(em, fg, bg, *args, reset=False):
-    s = ' '.join(str(arg) for arg in args)
+_color_depth = 'truecolor'
+_color_depth_context = contextvars.ContextVar('color_depth', default=NotImplemented)
+
+
+_color_depth_alias = {
+        'truecolor': 'truecolor', '24bit': 'truecolor', 24: 'truecolor',
+        '256': 256, 256: 256,
+        '16': 16, 16: 16,
+        '8': 8, 8: 8,
+        'none': None, None: None, 0: None,
+        }
+
+
+def _regulate_color_depth(depth):
+    if depth == 'auto':
+        return detect_color_depth()
+
+    try:
+        return _color_depth_alias[depth]
+    except (KeyError, TypeError):
+        raise ValueError('Invalid color depth: {}'.format(repr(depth)))
+
+
+@export
+def get_color_depth():
+    depth = _color_depth_context.get()
+    if depth is NotImplemented:
+        return _color_depth
+    return depth
+
+
+@export
+def set_color_depth(depth):
+    global _color_depth
+    _color_depth = _regulate_color_depth(depth)
+
+
+@export
+class color_depth:
+    def __init__(self, depth):
+        self.depth = _regulate_color_depth(depth)
+        self.token = None
+
+    def __enter__(self):
+        self.token = _color_depth_context.set(self.depth)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _color_depth_context.reset(self.token)
+
+
+@export
+def detect_color_depth(file=None):
+    import sys
+
+    file = file or sys.stdout
+    try:
+        tty = file.isatty()
+    except (AttributeError, ValueError):
+        return None
+
+    try:
+        fd = file.fileno()
+    except (AttributeError, ValueError, OSError):
+        fd = None
+
+    # Cache on the file descriptor, file objects are not referenced
+    return _detect_color_depth(fd, tty)
+
+
+@functools.lru_cache(maxsize=None)
+def _detect_color_depth(fd, tty):
+    import os
+
+    if os.environ.get('NO_COLOR') or not tty:
+        return None
+
+    term = os.environ.get('TERM', '')
+    if not term or term == 'dumb':
+        return None
+
+    if os.environ.get('COLORTERM', '').lower() in ('truecolor', '24bit') or term.endswith('direct'):
+        return 'truecolor'
 
-    code = ';'.join(filter(None, (
-        em.code if em is not None and em.code else None,
-        ('3' + fg.code) if fg is not None and fg.code else None,
-        ('4' + bg.code) if bg is not None and bg.code else None,
-        )))
+    if '256color' in term:
+        return 256
+
+    return 16
+
+
+detect_color_depth.cache_clear = _detect_color_depth.cache_clear
+
+
+@functools.lru_cache(maxsize=1024)
+def _sgr(reset, em_code, fg_code, bg_code):
+    code = ';'.join(filter(None, (em_code, fg_code, bg_code)))
 
     if reset and code:
         code = '0;' + code
@@ -29,26 +120,153 @@ def _apply(em, fg, bg, *args, reset=False):
     start = ('\033[' + code + 'm') if code or reset else ''
     end = '\033[m' if start else ''
 
+    return (start, end)
+
+
+def _code(obj):
+    return '' if obj is None else obj.code
+
+
+# Downgraded codes of colors, indexed by depth and then by (ground, code)
+_downgrade_table = {256: {}, 16: {}, 8: {}}
+
+
+def _ground_code(obj, ground, depth):
+    code = _code(obj)
+    if not code:
+        return ''
+
+    if depth == 'truecolor':
+        return ground + code
+
+    table = _downgrade_table[depth]
+    try:
+        return table[(ground, code)]
+    except KeyError:
+        pass
+
+    if isinstance(obj, Color8):
+        ret = ground + code
+
+    elif depth == 256:
+        ret = ground + (code if isinstance(obj, Color256) else obj.to_256().code)
+
+    elif depth == 16:
+        index = obj.to_256(palette=16).index
+        if index < 8:
+            ret = ground + str(index)
+        else:
+            ret = {'3': '9', '4': '10'}[ground] + str(index - 8)
+
+    else:
+        ret = ground + obj.to_8().code
+
+    table[(ground, code)] = ret
+    return ret
+
+
+def _sgr_at(depth, reset, em, fg, bg):
+    if depth is None:
+        return ('', '')
+    return _sgr(reset, _code(em), _ground_code(fg, '3', depth), _ground_code(bg, '4', depth))
+
+
+def _paint(sgr, args):
+    start, end = sgr
     if not args:
         return start
 
-    return start + s + end
+    if len(args) == 1 and type(args[0]) is str:
+        return start + args[0] + end
+
+    return start + ' '.join(str(arg) for arg in args) + end
+
+
+def _apply(em, fg, bg, *args, reset=False):
+    return _paint(_sgr_at(get_color_depth(), reset, em, fg, bg), args)
+
+
+def _reset_seq():
+    return '' if get_color_depth() is None else '\033[m'
+
+
+class _cached_code:
+    # Computes the decorated code property once and keeps it in the _code slot
+    def __init__(self, func):
+        self.func = func
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+
+        try:
+            return obj._code
+        except AttributeError:
+            code = self.func(obj)
+            object.__setattr__(obj, '_code', code)
+            return code
 
 
 class AbstractColor(abc.ABC):
+    __slots__ = ('_code', '_sgr')
+
     @property
     @abc.abstractmethod
     def seq(self): # pragma: no cover
         pass
 
+    def _setattrs(self, **attrs):
+        for name, value in attrs.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} object is immutable'.format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError('{} object is immutable'.format(type(self).__name__))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def _ctor_args(self):
+        return ((), {})
+
+    def __reduce__(self):
+        # __setattr__ is disabled, reconstruct from the constructor instead
+        args, kwargs = self._ctor_args()
+        if kwargs:
+            return (functools.partial(type(self), **kwargs), args)
+        return (type(self), args)
+
+    def _cached_sgr(self, role, depth, em=None, fg=None, bg=None):
+        try:
+            cache = self._sgr
+        except AttributeError:
+            cache = {}
+            object.__setattr__(self, '_sgr', cache)
+
+        try:
+            return cache[(role, depth)]
+        except KeyError:
+            sgr = cache[(role, depth)] = _sgr_at(depth, False, em, fg, bg)
+            return sgr
+
     def __eq__(self, other):
         if isinstance(other, AbstractColor):
             return self.seq == other.seq
         return self.seq == other
 
+    def __hash__(self):
+        return hash(self.seq)
+
 
 @export
 class NoColor(AbstractColor):
+    __slots__ = ()
+
     @property
     def seq(self):
         return '\033[m'
@@ -63,8 +281,11 @@ class NoColor(AbstractColor):
     def __eq__(self, other):
         return isinstance(other, self.__class__) or other == '\033[m'
 
+    def __hash__(self):
+        return hash('\033[m')
+
     def __str__(self):
-        return '\033[m'
+        return _reset_seq()
 
     def __or__(self, other):
         return other
@@ -84,20 +305,18 @@ class Emphasis(AbstractColor):
             'invisible': 8,
             }
 
+    __slots__ = tuple(ATTR_CODE)
+
     def __init__(self, *codes, bold=False, lowint=False, underline=False,
                  blink=False, reverse=False, invisible=False):
         if codes:
-            for name, code in Emphasis.ATTR_CODE.items():
-                setattr(self, name, code in codes)
+            self._setattrs(**{name: code in codes
+                              for name, code in Emphasis.ATTR_CODE.items()})
         else:
-            self.bold = bold
-            self.lowint = lowint
-            self.underline = underline
-            self.blink = blink
-            self.reverse = reverse
-            self.invisible = invisible
+            self._setattrs(bold=bold, lowint=lowint, underline=underline,
+                           blink=blink, reverse=reverse, invisible=invisible)
 
-    @property
+    @_cached_code
     def code(self):
         return ';'.join(str(Emphasis.ATTR_CODE[attr])
                         for attr in Emphasis.ATTR_CODE
@@ -106,7 +325,7 @@ class Emphasis(AbstractColor):
 
     @property
     def seq(self):
-        return _apply(self, None, None)
+        return self._cached_sgr('em', 'truecolor', em=self)[0]
 
     def __repr__(self):
         attrs = []
@@ -118,6 +337,10 @@ class Emphasis(AbstractColor):
                                 )
                 )
 
+    def _ctor_args(self):
+        return (tuple(code for attr, code in Emphasis.ATTR_CODE.items()
+                      if getattr(self, attr)), {})
+
     def __int__(self):
         ret = 0
         for attr, code in Emphasis.ATTR_CODE.items():
@@ -125,10 +348,10 @@ class Emphasis(AbstractColor):
         return ret
 
     def __call__(self, *args):
-        return _apply(self, None, None, *args)
+        return _paint(self._cached_sgr('em', get_color_depth(), em=self), args)
 
     def __str__(self):
-        return self.seq or '\033[m'
+        return self() or _reset_seq()
 
     def __or__(self, rhs):
         if rhs is None:
@@ -171,17 +394,15 @@ del _setup_named_emphasis
 
 @export
 class Color(AbstractColor):
+    __slots__ = ()
+
     @abc.abstractmethod
     def __init__(self, *args,
                  bold=False, lowint=False, underline=False,
                  blink=False, reverse=False, invisible=False,
-                 **kwargs): # pragma: no cover
-        self.bold = bold
-        self.lowint = lowint
-        self.underline = underline
-        self.blink = blink
-        self.reverse = reverse
-        self.invisible = invisible
+                 **kwargs):
+        # Emphasis options are accepted for compatibility, but not stored
+        pass
 
     @property
     @abc.abstractmethod
@@ -190,7 +411,7 @@ class Color(AbstractColor):
 
     @property
     def seq(self):
-        return _apply(None, self, None)
+        return self._cached_sgr('fg', 'truecolor', fg=self)[0]
 
     @abc.abstractmethod
     def __repr__(self): # pragma: no cover
@@ -204,17 +425,23 @@ class Color(AbstractColor):
         return self.fg(*args)
 
     def fg(self, *args):
-        return _apply(None, self, None, *args)
+        return _paint(self._cached_sgr('fg', get_color_depth(), fg=self), args)
 
     def bg(self, *args, **kwargs):
-        return _apply(None, None, self, *args)
+        return _paint(self._cached_sgr('bg', get_color_depth(), bg=self), args)
 
     def __str__(self):
-        return _apply(None, self, None) or '\033[m'
+        return self.fg() or _reset_seq()
 
     def __invert__(self):
         return ColorCompound(bg=self)
 
+    def to_256(self, metric='rgb', palette=256):
+        return _intern(Color256, _quantizer(palette, metric)(self.to_rgb().RGB))
+
+    def to_8(self, metric='rgb'):
+        return _intern(Color8, _quantizer(8, metric)(self.to_rgb().RGB))
+
     def __truediv__(self, other):
         if not isinstance(other, Color):
             raise TypeError('Only Color() / Color() is allowed')
@@ -228,35 +455,48 @@ class Color(AbstractColor):
         return ColorCompound(fg=self) | other
 
 
+@functools.lru_cache(maxsize=4096, typed=True)
+def _intern(cls, *args):
+    return cls(*args)
+
+
 @export
 def color(*args, **kwargs):
     nargs = len(args)
     arg1 = args[0] if len(args) == 1 else None
 
+    # Color objects are immutable, share instances if no options are given
+    def ctor(cls, *args):
+        if kwargs:
+            return cls(*args, **kwargs)
+        return _intern(cls, *args)
+
     # empty
     if not args:
-        return Color256(None)
+        return ctor(Color256, None)
 
     if nargs != 1:
         # ColorRGB ctor
         if len(args) == 3 and all(is_uint8(i) for i in args):
-            return ColorRGB(*args, **kwargs)
+            return ctor(ColorRGB, *args)
 
     # Copy ctor
     elif issubclass(type(arg1), Color):
+        if not kwargs:
+            return arg1
         return type(arg1)(*args, **kwargs)
 
     # Color256 ctor
     elif arg1 is None or is_uint8(arg1):
-        return Color256(*args, **kwargs)
+        return ctor(Color256, *args)
 
     # ColorRGB ctor #RRGGBB
     elif isinstance(arg1, str) and re.fullmatch(r'#[0-9A-Fa-f]{6}', arg1):
-        return ColorRGB(*args, **kwargs)
+        return ctor(ColorRGB, *args)
 
     # ColorHSV @H,S,V format
     elif isinstance(arg1, str) and re.fullmatch(r'@[0-9]+,[0-9]+,[0-9]+', arg1):
-        return ColorHSV(*args, **kwargs)
+        return ctor(ColorHSV, *args)
 
     elif isinstance(arg1, str):
         return _parse(arg1)
@@ -264,8 +504,37 @@ def color(*args, **kwargs):
     raise TypeError('Invalid arguments: {}'.format(args))
 
 
+def _color256_to_rgb(index):
+    if index < 16:
+        base = 0xFF if (index > 7) else 0x80
+        is_7 = (index == 7)
+        is_8 = (index == 8)
+        R = base * ((index & 0x1) != 0) + (0x40 * is_7) + (0x80 * is_8)
+        G = base * ((index & 0x2) != 0) + (0x40 * is_7) + (0x80 * is_8)
+        B = base * ((index & 0x4) != 0) + (0x40 * is_7) + (0x80 * is_8)
+
+    elif index < 232:
+        base = index - 16
+        index_R = (base // 36)
+        index_G = ((base % 36) // 6)
+        index_B = (base % 6)
+        R = (55 + index_R * 40) if index_R > 0 else 0
+        G = (55 + index_G * 40) if index_G > 0 else 0
+        B = (55 + index_B * 40) if index_B > 0 else 0
+
+    else:
+        R = G = B = (index - 232) * 10 + 8
+
+    return (R, G, B)
+
+
+_color256_rgb_table = tuple(_color256_to_rgb(i) for i in range(256))
+
+
 @export
 class Color8(Color):
+    __slots__ = ('index',)
+
     def __init__(self, index=None, **kwargs):
         super().__init__(**kwargs)
         if isinstance(index, self.__class__):
@@ -281,23 +550,26 @@ class Color8(Color):
         if no:
             raise no('Invalid color index: {}'.format(index))
 
-        self.index = index
+        self._setattrs(index=index)
 
     def __repr__(self):
         return '{name}({index})'.format(
                 name=self.__class__.__name__,
                 index=self.index)
 
+    def _ctor_args(self):
+        return ((self.index,), {})
+
     def __int__(self):
         return self.index
 
-    @property
+    @_cached_code
     def code(self):
         if self.index is None:
             return ''
         return str(self.index)
 
-    def to_256(self):
+    def to_256(self, metric='rgb', palette=256):
         return Color256(self.index)
 
     def to_rgb(self):
@@ -309,6 +581,8 @@ class Color8(Color):
 
 @export
 class Color256(Color):
+    __slots__ = ('index',)
+
     def __init__(self, index=None, **kwargs):
         super().__init__(**kwargs)
         if isinstance(index, self.__class__):
@@ -324,44 +598,32 @@ class Color256(Color):
         if no:
             raise no('Invalid color index: {}'.format(index))
 
-        self.index = index
+        self._setattrs(index=index)
 
     def __repr__(self):
         return '{name}({index})'.format(
                 name=self.__class__.__name__,
                 index=self.index)
 
+    def _ctor_args(self):
+        return ((self.index,), {})
+
     def __int__(self):
         return self.index
 
-    @property
+    @_cached_code
     def code(self):
         if self.index is None:
             return ''
         return '8;5;{}'.format(self.index)
 
-    def to_rgb(self):
-        if self.index < 16:
-            base = 0xFF if (self.index > 7) else 0x80
-            is_7 = (self.index == 7)
-            is_8 = (self.index == 8)
-            R = base * ((self.index & 0x1) != 0) + (0x40 * is_7) + (0x80 * is_8)
-            G = base * ((self.index & 0x2) != 0) + (0x40 * is_7) + (0x80 * is_8)
-            B = base * ((self.index & 0x4) != 0) + (0x40 * is_7) + (0x80 * is_8)
-
-        elif self.index < 232:
-            base = self.index - 16
-            index_R = (base // 36)
-            index_G = ((base % 36) // 6)
-            index_B = (base % 6)
-            R = (55 + index_R * 40) if index_R > 0 else 0
-            G = (55 + index_G * 40) if index_G > 0 else 0
-            B = (55 + index_B * 40) if index_B > 0 else 0
-
-        else:
-            R = G = B = (self.index - 232) * 10 + 8
+    def to_256(self, metric='rgb', palette=256):
+        if palette == 256 or self.index is None or self.index < palette:
+            return self
+        return super().to_256(metric, palette)
 
-        return ColorRGB(R, G, B)
+    def to_rgb(self):
+        return ColorRGB(*_color256_rgb_table[self.index])
 
     def to_hsv(self):
         return self.to_rgb().to_hsv()
@@ -369,6 +631,8 @@ class Color256(Color):
 
 @export
 class ColorRGB(Color):
+    __slots__ = ('r', 'g', 'b')
+
     def __init__(self, *args, overflow=False, **kwargs):
         super().__init__(**kwargs)
 
@@ -379,37 +643,42 @@ class ColorRGB(Color):
                       if not overflow
                       else lambda x: isinstance(x, (int, float)))
 
-        self.r = None
-        self.g = None
-        self.b = None
+        r = g = b = None
 
         if not args:
-            return
+            pass
 
         elif nargs != 1:
             # (num, num, num) format
             if len(args) == 3 and all(type_check(i) for i in args):
-                (self.r, self.g, self.b) = args
+                (r, g, b) = args
 
         # Copy ctor
         elif isinstance(arg1, self.__class__):
-            (self.r, self.g, self.b) = arg1.rgb
+            (r, g, b) = arg1.rgb
 
         # #RRGGBB format
         elif isinstance(arg1, str) and re.fullmatch(r'#[0-9A-Fa-f]{6}', arg1):
             rgb_str = arg1[1:]
-            self.r = int(rgb_str[0:2], 16)
-            self.g = int(rgb_str[2:4], 16)
-            self.b = int(rgb_str[4:6], 16)
+            r = int(rgb_str[0:2], 16)
+            g = int(rgb_str[2:4], 16)
+            b = int(rgb_str[4:6], 16)
 
-        if None in self.rgb:
+        if args and None in (r, g, b):
             raise TypeError('Invalid RGB value: {}'.format(args))
 
+        self._setattrs(r=r, g=g, b=b)
+
     def __repr__(self):
         return '{name}({self.r}, {self.g}, {self.b})'.format(
                 name=self.__class__.__name__,
                 self=self)
 
+    def _ctor_args(self):
+        if self.r is None:
+            return ((), {})
+        return ((self.r, self.g, self.b), {'overflow': True})
+
     @property
     def R(self):
         return 0 if self.r is None else clamp(0, round(self.r), 255)
@@ -430,7 +699,7 @@ class ColorRGB(Color):
     def rgb(self):
         return (self.r, self.g, self.b)
 
-    @property
+    @_cached_code
     def code(self):
         if None in self.rgb:
             return ''
@@ -470,20 +739,19 @@ class ColorRGB(Color):
 
 @export
 class ColorHSV(Color):
+    __slots__ = ('h', 's', 'v')
+
     def __init__(self, *args, overflow=False, **kwargs):
         super().__init__(**kwargs)
 
         arg1 = args[0] if len(args) else None
 
-        self.h = None
-        self.s = None
-        self.v = None
-
         h = None
         s = None
         v = None
 
         if not args:
+            self._setattrs(h=h, s=s, v=v)
             return
 
         # Copy ctor
@@ -504,8 +772,7 @@ class ColorHSV(Color):
             overflow or
             ((s is not None and 0 <= s <= 100) and
              (v is not None and 0 <= v <= 100))):
-            (self.h, self.s, self.v) = (h % 360, s, v)
-            self._rgb = self.to_rgb(overflow)
+            self._setattrs(h=h % 360, s=s, v=v)
 
         else:
             raise TypeError('Invalid HSV value: {}'.format(args))
@@ -515,6 +782,11 @@ class ColorHSV(Color):
                 name=self.__class__.__name__,
                 h=self.h, s=self.s, v=self.v)
 
+    def _ctor_args(self):
+        if self.h is None:
+            return ((), {})
+        return ((self.h, self.s, self.v), {'overflow': True})
+
     @property
     def H(self):
         return 0 if self.h is None else ((round(self.h) + 360) % 360)
@@ -535,11 +807,11 @@ class ColorHSV(Color):
     def hsv(self):
         return (self.h, self.s, self.v)
 
-    @property
+    @_cached_code
     def code(self):
         if None in self.hsv:
             return ''
-        return self._rgb.code
+        return self.to_rgb().code
 
     def __add__(self, other):
         hsv = vector(self.hsv) + vector(other.hsv)
@@ -572,37 +844,289 @@ class ColorHSV(Color):
         return self
 
 
+def _is_ndarray(data):
+    return type(data).__module__ == 'numpy' and type(data).__name__ == 'ndarray'
+
+
+def _triples(data):
+    import array
+    if isinstance(data, (array.array, bytes, bytearray, memoryview)):
+        it = iter(data)
+        return zip(it, it, it)
+    return data
+
+
+@export
+def rgb_to_hsv(data):
+    if _is_ndarray(data):
+        return _rgb_to_hsv_numpy(data)
+
+    import colorsys
+    convert = colorsys.rgb_to_hsv
+    ret = []
+    for r, g, b in _triples(data):
+        h, s, v = convert(
+                min(max(round(r), 0), 255) / 255,
+                min(max(round(g), 0), 255) / 255,
+                min(max(round(b), 0), 255) / 255)
+        ret.append(((h * 360) % 360, s * 100, v * 100))
+    return ret
+
+
+@export
+def hsv_to_rgb(data):
+    if _is_ndarray(data):
+        return _hsv_to_rgb_numpy(data)
+
+    import colorsys
+    convert = colorsys.hsv_to_rgb
+    ret = []
+    for h, s, v in _triples(data):
+        r, g, b = convert(
+                ((round(h % 360) + 360) % 360) / 360,
+                min(max(round(s), 0), 100) / 100,
+                min(max(round(v), 0), 100) / 100)
+        ret.append((r * 255, g * 255, b * 255))
+    return ret
+
+
+@export
+def color256_to_rgb(data):
+    if _is_ndarray(data):
+        import numpy as np
+        return np.array(_color256_rgb_table, dtype=np.uint8)[data]
+
+    table = _color256_rgb_table
+    return [table[index] for index in data]
+
+
+def _rgb_to_hsv_numpy(data):
+    # Follows colorsys.rgb_to_hsv() step by step to produce identical results
+    import numpy as np
+    rgb = np.clip(np.round(np.asarray(data, dtype=np.float64)), 0, 255) / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    rangec = maxc - minc
+    gray = (rangec == 0)
+    maxc_nz = np.where(maxc == 0, 1, maxc)
+    rangec_nz = np.where(gray, 1, rangec)
+
+    s = np.where(gray, 0.0, rangec / maxc_nz)
+    rc = (maxc - r) / rangec_nz
+    gc = (maxc - g) / rangec_nz
+    bc = (maxc - b) / rangec_nz
+    h = np.where(r == maxc, bc - gc,
+                 np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+
+    return np.stack(((h * 360) % 360, s * 100, maxc * 100), axis=-1)
+
+
+def _hsv_to_rgb_numpy(data):
+    # Follows colorsys.hsv_to_rgb() step by step to produce identical results
+    import numpy as np
+    hsv = np.asarray(data, dtype=np.float64)
+    h = ((np.round(hsv[..., 0] % 360) + 360) % 360) / 360
+    s = np.clip(np.round(hsv[..., 1]), 0, 100) / 100
+    v = np.clip(np.round(hsv[..., 2]), 0, 100) / 100
+
+    i = (h * 6.0).astype(np.int64)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+
+    r = np.choose(i, (v, q, p, p, t, v))
+    g = np.choose(i, (t, v, v, q, p, p))
+    b = np.choose(i, (p, p, t, v, v, q))
+
+    gray = (s == 0.0)
+    r = np.where(gray, v, r)
+    g = np.where(gray, v, g)
+    b = np.where(gray, v, b)
+
+    return np.stack((r, g, b), axis=-1) * 255
+
+
+def _srgb_to_lab(rgb):
+    def linear(c):
+        c = c / 255
+        return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+    def f(t):
+        return t ** (1 / 3) if t > 216 / 24389 else (24389 / 27 * t + 16) / 116
+
+    r, g, b = (linear(c) for c in rgb)
+    fx = f((0.4124 * r + 0.3576 * g + 0.1805 * b) / 0.95047)
+    fy = f((0.2126 * r + 0.7152 * g + 0.0722 * b))
+    fz = f((0.0193 * r + 0.1192 * g + 0.9505 * b) / 1.08883)
+    return (116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz))
+
+
+def _dist_rgb(p, q):
+    return (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+
+
+def _dist_weighted(p, q):
+    # "redmean" approximation, see https://www.compuphase.com/cmetric.htm
+    rmean = (p[0] + q[0]) / 2
+    return ((2 + rmean / 256) * (p[0] - q[0]) ** 2 +
+            4 * (p[1] - q[1]) ** 2 +
+            (2 + (255 - rmean) / 256) * (p[2] - q[2]) ** 2)
+
+
+_quantize_metrics = {
+        'rgb': (lambda rgb: rgb, _dist_rgb),
+        'weighted': (lambda rgb: rgb, _dist_weighted),
+        'cie76': (_srgb_to_lab, _dist_rgb),
+        }
+
+
+class _Quantizer:
+    # Index of nearest cube level (0, 95, 135, 175, 215, 255) for each channel value
+    cube_index = tuple(sum(c > m for m in (47.5, 115, 155, 195, 235)) for c in range(256))
+
+    def __init__(self, size, metric):
+        if size not in (8, 16, 256):
+            raise ValueError('Invalid palette size: {}'.format(size))
+
+        if metric not in _quantize_metrics:
+            raise ValueError('Invalid metric: {}'.format(metric))
+
+        self.size = size
+        self.metric = metric
+        self.transform, self.dist = _quantize_metrics[metric]
+        self.palette = tuple(self.transform(rgb) for rgb in _color256_rgb_table[:size])
+
+        # Euclidean distance on 6x6x6 cube and grayscale ramp is separable,
+        # only a few candidates need to be checked
+        if size == 256 and metric == 'rgb':
+            self.candidates = self.candidates_rgb256
+        else:
+            self.candidates = lambda rgb: range(self.size)
+
+        self.lookup = functools.lru_cache(maxsize=65536)(self.nearest)
+
+    def candidates_rgb256(self, rgb):
+        r, g, b = rgb
+        ci = self.cube_index
+        gray = clamp(0, (r + g + b - 24) // 30, 22)
+        return (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15,
+                16 + ci[r] * 36 + ci[g] * 6 + ci[b], 232 + gray, 233 + gray)
+
+    def nearest(self, rgb):
+        p = self.transform(rgb)
+        dist = self.dist
+        palette = self.palette
+        return min(self.candidates(rgb), key=lambda idx: (dist(p, palette[idx]), idx))
+
+    def __call__(self, rgb):
+        return self.lookup(rgb)
+
+    def nearest_numpy(self, rgb):
+        import numpy as np
+        palette = np.array(self.palette, dtype=np.float64)
+        p = self.transform_numpy(rgb)
+
+        ret = np.empty(len(p), dtype=np.uint8)
+        step = 4096
+        for i in range(0, len(p), step):
+            chunk = p[i:i+step, np.newaxis, :]
+            if self.metric == 'weighted':
+                rmean = (chunk[..., 0] + palette[:, 0]) / 2
+                d = chunk - palette
+                dist = ((2 + rmean / 256) * d[..., 0] ** 2 +
+                        4 * d[..., 1] ** 2 +
+                        (2 + (255 - rmean) / 256) * d[..., 2] ** 2)
+            else:
+                dist = ((chunk - palette) ** 2).sum(axis=-1)
+            ret[i:i+step] = dist.argmin(axis=-1)
+
+        return ret
+
+    def transform_numpy(self, rgb):
+        if self.metric != 'cie76':
+            return rgb
+
+        import numpy as np
+        c = rgb / 255
+        c = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+        r, g, b = c[:, 0], c[:, 1], c[:, 2]
+        xyz = np.stack((
+            (0.4124 * r + 0.3576 * g + 0.1805 * b) / 0.95047,
+            (0.2126 * r + 0.7152 * g + 0.0722 * b),
+            (0.0193 * r + 0.1192 * g + 0.9505 * b) / 1.08883,
+            ), axis=-1)
+        f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+        fx, fy, fz = f[:, 0], f[:, 1], f[:, 2]
+        return np.stack((116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)), axis=-1)
+
+
+@functools.lru_cache(maxsize=None)
+def _quantizer(size, metric):
+    return _Quantizer(size, metric)
+
+
+@export
+def rgb_to_color256(data, palette=256, metric='rgb'):
+    quantize = _quantizer(palette, metric)
+
+    if _is_ndarray(data):
+        return _rgb_to_color256_numpy(data, quantize)
+
+    return [quantize((
+        min(max(round(r), 0), 255),
+        min(max(round(g), 0), 255),
+        min(max(round(b), 0), 255)))
+        for r, g, b in _triples(data)]
+
+
+def _rgb_to_color256_numpy(data, quantize):
+    import numpy as np
+    rgb = np.clip(np.round(np.asarray(data, dtype=np.float64)), 0, 255)
+    shape = rgb.shape[:-1]
+
+    # Only distinct colors need to be measured
+    uniq, inverse = np.unique(rgb.reshape(-1, 3), axis=0, return_inverse=True)
+    return quantize.nearest_numpy(uniq)[inverse.reshape(-1)].reshape(shape)
+
+
 @export
 class ColorCompound(AbstractColor):
-    def __init__(self, *, reset=False, em=None, fg=None, bg=None):
-        self.reset = reset
+    __slots__ = ('reset', 'em', 'fg', 'bg')
 
+    def __init__(self, *, reset=False, em=None, fg=None, bg=None):
         if em is None:
-            self.em = None
+            pass
         elif isinstance(em, Emphasis):
-            self.em = em
+            pass
         elif isinstance(em, self.__class__):
-            self.em = em.em
+            em = em.em
         else:
             raise TypeError('Invalid em: {}'.format(em))
 
         if fg is None:
-            self.fg = None
+            pass
         elif isinstance(fg, self.__class__):
-            self.fg = fg.fg
+            fg = fg.fg
         else:
-            self.fg = color(fg)
+            fg = color(fg)
 
         if bg is None:
-            self.bg = None
+            pass
         elif isinstance(bg, self.__class__):
-            self.bg = bg.bg
+            bg = bg.bg
         else:
-            self.bg = color(bg)
+            bg = color(bg)
+
+        self._setattrs(reset=reset, em=em, fg=fg, bg=bg)
 
     @property
     def seq(self):
-        return _apply(self.em, self.fg, self.bg, reset=self.reset)
+        return _sgr_at('truecolor', self.reset, self.em, self.fg, self.bg)[0]
 
     def __repr__(self):
         return '{clsname}(reset={reset}, em={em}, fg={fg}, bg={bg})'.format(
@@ -611,11 +1135,14 @@ class ColorCompound(AbstractColor):
                 em=repr(self.em),
                 fg=repr(self.fg), bg=repr(self.bg))
 
+    def _ctor_args(self):
+        return ((), {'reset': self.reset, 'em': self.em, 'fg': self.fg, 'bg': self.bg})
+
     def __call__(self, *args):
         return _apply(self.em, self.fg, self.bg, *args, reset=self.reset)
 
     def __str__(self):
-        return self.seq or '\033[m'
+        return self() or _reset_seq()
 
     def __or__(self, other):
         if isinstance(other, NoColor):
@@ -824,100 +1351,186 @@ _setup_named_colors()
 del _setup_named_colors
 
 
-color_esc_seq_regex = re.compile('\033' + r'\[[\d;]*m')
+_esc_seq_patterns = {
+        # (complete sequence, incomplete tail)
+        False: (r'\[[0-9;]*m', r'(\[[0-9;]*)?'),
+        True: (r'\[[0-?]*[ -/]*[@-~]|\][^\007\033]*(\007|\033\\)',
+               r'(\[[0-?]*[ -/]*|\][^\007\033]*\033?)?'),
+        }
 
-@export
-def decolor(s):
-    return color_esc_seq_regex.sub('', s)
 
+@functools.lru_cache(maxsize=None)
+def _esc_seq_regex(binary, escapes):
+    seq, tail = _esc_seq_patterns[escapes]
+    seq, tail = '\033(' + seq + ')', '\033' + tail + r'\Z'
+    if binary:
+        seq, tail = seq.encode(), tail.encode()
+    return re.compile(seq), re.compile(tail)
 
-def _tokenize(seq):
-    tokens = []
-    matching = 0
-    buf = ''
-    for char in seq:
-        if char == '\033':
-            matching = 1
-            buf = ''
-            continue
-
-        if matching == 1 and char == '[':
-            matching = 2
-            buf = ''
-            continue
-
-        elif matching == 2:
-            if char not in '0123456789;m':
-                buf = ''
-                matching = 0
-                continue
-
-            if char == 'm':
-                empty = True
-                for token in buf.split(';'):
-                    if token:
-                        empty = False
-                        tokens.append(int(token, 10))
-                if empty:
-                    tokens.append(0)
-                buf = ''
-                matching = 0
-                continue
 
-            else:
-                buf += char
+color_esc_seq_regex = _esc_seq_regex(False, False)[0]
+
+
+def _chunks(source, chunksize):
+    if isinstance(source, (str, bytes)):
+        return (source,)
+
+    if isinstance(source, io.IOBase) or isinstance(getattr(source, 'file', None), io.IOBase):
+        read = getattr(source, 'read1', source.read)
+        return iter(lambda: read(chunksize) or None, None)
+
+    return source
 
+
+@export
+def decolor(s, escapes=False):
+    binary = isinstance(s, bytes)
+    return _esc_seq_regex(binary, escapes)[0].sub(b'' if binary else '', s)
+
+
+@export
+def decolor_stream(source, chunksize=65536, escapes=False):
+    pending = None
+    for chunk in _chunks(source, chunksize):
+        if pending is None:
+            seq_regex, tail_regex = _esc_seq_regex(isinstance(chunk, bytes), escapes)
+            pending = chunk[:0]
+
+        data = pending + chunk
+
+        # Hold back incomplete sequence at the end of chunk
+        m = tail_regex.search(data, max(0, len(data) - 1024))
+        if m:
+            data, pending = data[:m.start()], data[m.start():]
         else:
-            matching = 0
+            pending = data[:0]
+
+        data = seq_regex.sub(data[:0], data)
+        if data:
+            yield data
+
+    if pending:
+        yield pending
+
+
+_sgr_seq_regex = re.compile('\033' + r'\[([0-9;]*)m')
+
+
+def _tokenize(seq):
+    tokens = []
+    for params in _sgr_seq_regex.findall(seq):
+        codes = [int(token, 10) for token in params.split(';') if token]
+        tokens += codes or [0]
 
     return tokens or None
 
 
+@functools.lru_cache(maxsize=1024)
 def _parse(seq):
-    attr = {}
-
     tokens = _tokenize(seq)
     if tokens is None:
         return ColorCompound()
 
-    codes = []
-    while tokens:
-        if tokens[0] == 0:
-            tokens.pop(0)
-            attr = {'reset': True}
-            continue
-
-        if tokens[0] in (1, 2, 4, 5, 7, 8):
-            attr['em'] = attr.get('em', Emphasis()) | Emphasis(tokens.pop(0))
-            continue
-
-        if (30 <= tokens[0] <= 37) or (40 <= tokens[0] <= 47):
-            t = tokens.pop(0)
-            attr['fg' if t < 40 else 'bg'] = Color8(t % 10)
-            continue
-
-        if tokens[0] not in (38, 48):
-            tokens.pop(0)
-            continue
-        ground = tokens.pop(0)
-
-        if not tokens or tokens[0] not in (2, 5):
-            if tokens:
-                tokens.pop(0)
-            continue
-        color_type = tokens.pop(0)
-
-        if color_type == 5:
-            if tokens:
-                attr['fg' if ground < 40 else 'bg'] = Color256(tokens.pop(0))
-            continue
-
-        # color_type == 2
-        if tokens and len(tokens) >= 3:
-            attr['fg' if ground < 40 else 'bg'] = ColorRGB(*tokens[:3])
-            tokens = tokens[3:]
-
-    return ColorCompound(**attr)
+    reset = False
+    em = set()
+    fg = None
+    bg = None
+
+    idx = 0
+    count = len(tokens)
+    while idx < count:
+        token = tokens[idx]
+        idx += 1
+
+        if token == 0:
+            reset = True
+            em = set()
+            fg = None
+            bg = None
+
+        elif token in (1, 2, 4, 5, 7, 8):
+            em.add(token)
+
+        elif 30 <= token <= 37:
+            fg = _intern(Color8, token - 30)
+
+        elif 40 <= token <= 47:
+            bg = _intern(Color8, token - 40)
+
+        elif 90 <= token <= 97:
+            fg = _intern(Color256, token - 90 + 8)
+
+        elif 100 <= token <= 107:
+            bg = _intern(Color256, token - 100 + 8)
+
+        elif token in (38, 48) and idx < count:
+            # The token after 38/48 is consumed even if it's not a valid color type
+            color_type = tokens[idx]
+            idx += 1
+
+            c = None
+            if color_type == 5 and idx < count:
+                c = _intern(Color256, tokens[idx])
+                idx += 1
+
+            elif color_type == 2 and count - idx >= 3:
+                c = _intern(ColorRGB, *tokens[idx:idx+3])
+                idx += 3
+
+            if c is None:
+                pass
+            elif token == 38:
+                fg = c
+            else:
+                bg = c
+
+    return ColorCompound(reset=reset, em=Emphasis(*em) if em else None, fg=fg, bg=bg)
+
+
+@functools.lru_cache(maxsize=1024)
+def _transit(style, seq):
+    ret = _parse(style.seq + seq)
+    if ret.reset:
+        ret = ColorCompound(em=ret.em, fg=ret.fg, bg=ret.bg)
+    return ret
+
+
+@export
+def segments(source, chunksize=65536, encoding='utf8'):
+    chunks = _chunks(source, chunksize)
+
+    decoder = None
+    style = ColorCompound()
+    pending = ''
+    for chunk in itertools.chain(chunks, (None,)):
+        if isinstance(chunk, (bytes, bytearray)):
+            # Multi-byte characters may be split across chunks
+            if decoder is None:
+                import codecs
+                decoder = codecs.getincrementaldecoder(encoding)(errors='backslashreplace')
+            chunk = decoder.decode(chunk)
+
+        if chunk is None:
+            # End of input, flush incomplete sequence as text
+            data = pending + (decoder.decode(b'', final=True) if decoder else '')
+        else:
+            data = pending + chunk
+            pending = ''
+
+            # Hold back incomplete sequence at the end of chunk
+            esc = data.rfind('\033', max(0, len(data) - 1024))
+            if esc >= 0 and re.fullmatch('\033' + r'(\[[0-9;]*)?', data[esc:]):
+                data, pending = data[:esc], data[esc:]
+
+        pos = 0
+        for m in _sgr_seq_regex.finditer(data):
+            if m.start() > pos:
+                yield (style, data[pos:m.start()])
+            style = _transit(style, m.group(0))
+            pos = m.end()
+
+        if pos < len(data):
+            yield (style, data[pos:])
 
 
 @export
@@ -1,11 +1,14 @@
 import time
 import os
+import io
+import codecs
 import queue
+import selectors
 import subprocess as sub
 import threading
 
 from signal import SIGINT, SIGTERM, SIGKILL
-from collections import UserList
+from collections import UserList, deque
 
 from .lib_itertools import is_iterable
 
@@ -47,16 +50,176 @@ class QueueEventAdapter:
         self.Q = Q
 
     def __call__(self, line):
+        if isinstance(line, memoryview):
+            line = line.tobytes()
         self.Q.put(line)
 
 
+DEFAULT_CHUNKSIZE = 65536
+
+def write_chunk(self_stream, view, zerocopy, force=False):
+    if zerocopy:
+        # The buffer is reused, only valid during the call
+        self_stream.hub.broadcast(view)
+    else:
+        self_stream.write(view.tobytes(), force=force)
+
+
+class Batch(list):
+    pass
+
+
+def sizeof(data):
+    if isinstance(data, (str, bytes)):
+        return (1, len(data))
+    if data is None:
+        return (0, 0)
+    if isinstance(data, Batch):
+        return (len(data), sum(sizeof(line)[1] for line in data))
+    return (1, len(data) if hasattr(data, '__len__') else 0)
+
+
+OVERFLOW_POLICIES = ('block', 'drop-oldest', 'drop-newest')
+
+class StreamQueue(queue.Queue):
+    def __init__(self, maxlines=None, maxbytes=None, overflow='block'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Invalid overflow policy: ' + repr(overflow))
+
+        super().__init__()
+        self.maxlines = maxlines
+        self.maxbytes = maxbytes
+        self.overflow = overflow
+        self.bounded = bool(maxlines or maxbytes)
+        self.lines = 0
+        self.size = 0
+        self.dropped_lines = 0
+        self.dropped_bytes = 0
+        self.closed = False
+        self.released = False
+        self.drain_waiters = []
+
+    @property
+    def full(self):
+        return bool((self.maxlines and self.lines >= self.maxlines) or
+                    (self.maxbytes and self.size >= self.maxbytes))
+
+    @property
+    def overflowed(self):
+        return bool((self.maxlines and self.lines > self.maxlines) or
+                    (self.maxbytes and self.size > self.maxbytes))
+
+    def put(self, item, block=True, timeout=None, force=False):
+        # force: ignore the capacity, the caller throttles itself
+        if not self.bounded:
+            return super().put(item, block, timeout)
+
+        with self.not_full:
+            if item is None:
+                self.closed = True
+                self.not_full.notify_all()
+                self.notify_drain_waiters()
+
+            elif self.full:
+                if self.overflow == 'drop-newest' or self.released:
+                    self.drop(item)
+                    return
+
+                if self.overflow == 'block' and not force:
+                    if not block:
+                        raise queue.Full
+
+                    if timeout is not None:
+                        deadline = time.monotonic() + timeout
+                    while self.full and not self.closed and not self.released:
+                        if timeout is None:
+                            self.not_full.wait()
+                        else:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                raise queue.Full
+                            self.not_full.wait(remaining)
+
+                    if self.closed:
+                        return
+
+                    if self.released and self.full:
+                        self.drop(item)
+                        return
+
+            self._put(item)
+            if self.overflow == 'drop-oldest' and item is not None:
+                while self.overflowed and len(self.queue) > 1:
+                    lines, size = sizeof(self.queue.popleft())
+                    self.lines -= lines
+                    self.size -= size
+                    self.dropped_lines += lines
+                    self.dropped_bytes += size
+
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _put(self, item):
+        if self.bounded:
+            lines, size = sizeof(item)
+            self.lines += lines
+            self.size += size
+        super()._put(item)
+
+    def _get(self):
+        item = super()._get()
+        if self.bounded and item is not None:
+            full = self.full
+            lines, size = sizeof(item)
+            self.lines -= lines
+            self.size -= size
+            if full and not self.full:
+                self.not_full.notify_all()
+                self.notify_drain_waiters()
+        return item
+
+    def drop(self, item):
+        lines, size = sizeof(item)
+        self.dropped_lines += lines
+        self.dropped_bytes += size
+
+    def release(self):
+        # Nobody is going to read, stop applying backpressure to the writer
+        with self.not_full:
+            self.released = True
+            self.not_full.notify_all()
+            self.notify_drain_waiters()
+
+    def add_drain_waiter(self, waiter):
+        with self.mutex:
+            if self.closed or self.released or not self.full:
+                waiter()
+            else:
+                self.drain_waiters.append(waiter)
+
+    def notify_drain_waiters(self):
+        waiters, self.drain_waiters = self.drain_waiters, []
+        for waiter in waiters:
+            waiter()
+
+
 class stream:
-    def __init__(self):
-        self.queue = queue.Queue()
+    def __init__(self, *, maxlines=None, maxbytes=None, overflow='block'):
+        self.queue = StreamQueue(maxlines, maxbytes, overflow)
+        self.pending = deque()
+        self.batch = False
         self.keep = False
-        self.lines = []
+        if not self.queue.bounded:
+            self.lines = []
+        elif maxbytes or overflow == 'drop-newest':
+            self.lines = deque()
+        else:
+            self.lines = deque(maxlen=maxlines)
+        self.lines_size = 0
         self.eof = threading.Event()
         self.hub = EventBroadcaster()
+        self.waker = None
+        self.async_waiters = []
 
         self.pipe_count_lock = threading.Lock()
         self.pipe_count = 0
@@ -95,34 +258,179 @@ class stream:
                 self.close()
 
     def read(self):
-        data = self.queue.get()
-        return data
+        while True:
+            try:
+                return self.pending.popleft()
+            except IndexError:
+                pass
+
+            data = self.queue.get()
+            if not isinstance(data, Batch):
+                return data
+            self.pending.extend(data)
+
+    def batches(self):
+        if self.closed:
+            if self.lines:
+                yield list(self.lines)
+            return
+
+        while True:
+            if self.pending:
+                batch = []
+                while self.pending:
+                    batch.append(self.pending.popleft())
+                yield batch
+
+            data = self.queue.get()
+            if data is None:
+                break
+            yield data if isinstance(data, Batch) else [data]
+
+    def retain(self, lines):
+        Q = self.queue
+        if not Q.maxbytes and Q.overflow != 'drop-newest':
+            self.lines.extend(lines)
+            return
+
+        for line in lines:
+            if Q.overflow == 'drop-newest' and (
+                    (Q.maxlines and len(self.lines) >= Q.maxlines) or
+                    (Q.maxbytes and self.lines_size >= Q.maxbytes)):
+                return
+
+            self.lines.append(line)
+            self.lines_size += sizeof(line)[1]
+            while len(self.lines) > 1 and (
+                    (Q.maxlines and len(self.lines) > Q.maxlines) or
+                    (Q.maxbytes and self.lines_size > Q.maxbytes)):
+                self.lines_size -= sizeof(self.lines.popleft())[1]
 
     def readline(self):
         return self.read()
 
-    def write(self, data, *, suppress=True):
+    def write(self, data, *, suppress=True, block=True, timeout=None, force=False):
         if self.closed:
             if suppress:
                 return
             raise BrokenPipeError('stream already closed')
 
+        self.queue.put(data, block, timeout, force)
         if self.keep:
-            self.lines.append(data)
+            self.retain((data,))
 
-        self.queue.put(data)
         self.hub.broadcast(data)
+        waker = self.waker
+        if waker:
+            waker()
+        if self.async_waiters:
+            self.notify_async_waiters()
 
-    def writeline(self, line, *, suppress=True):
-        self.write(line, suppress=suppress)
+    def writeline(self, line, *, suppress=True, block=True, timeout=None, force=False):
+        self.write(line, suppress=suppress, block=block, timeout=timeout, force=force)
 
     def writelines(self, lines):
         for line in lines:
             self.writeline(line)
 
+    def write_batch(self, lines, *, suppress=True, block=True, timeout=None, force=False):
+        if self.closed:
+            if suppress:
+                return
+            raise BrokenPipeError('stream already closed')
+
+        size = self.batch if self.batch is not True and self.batch else len(lines)
+        for i in range(0, len(lines), size or 1):
+            batch = Batch(lines[i:i+size])
+            self.queue.put(batch, block, timeout, force)
+            if self.keep:
+                self.retain(batch)
+
+            if self.batch:
+                self.hub.broadcast(batch)
+            else:
+                for line in batch:
+                    self.hub.broadcast(line)
+
+            waker = self.waker
+            if waker:
+                waker()
+            if self.async_waiters:
+                self.notify_async_waiters()
+
     def close(self):
         self.eof.set()
         self.queue.put(None)
+        waker = self.waker
+        if waker:
+            waker()
+        if self.async_waiters:
+            self.notify_async_waiters()
+
+    def notify_async_waiters(self):
+        while self.async_waiters:
+            try:
+                self.async_waiters.pop()()
+            except IndexError: # pragma: no cover
+                break
+
+    async def aread(self):
+        import asyncio
+        while True:
+            try:
+                return self.pending.popleft()
+            except IndexError:
+                pass
+
+            try:
+                data = self.queue.get_nowait()
+                if not isinstance(data, Batch):
+                    return data
+                self.pending.extend(data)
+                continue
+            except queue.Empty:
+                pass
+
+            loop = asyncio.get_event_loop()
+            readable = loop.create_future()
+            def waiter():
+                loop.call_soon_threadsafe(lambda: readable.done() or readable.set_result(True))
+
+            self.async_waiters.append(waiter)
+            try:
+                if self.queue.empty():
+                    await readable
+            finally:
+                if waiter in self.async_waiters:
+                    self.async_waiters.remove(waiter)
+
+    async def areadline(self):
+        return await self.aread()
+
+    async def adrain(self):
+        import asyncio
+        loop = asyncio.get_event_loop()
+        drained = loop.create_future()
+        def waiter():
+            loop.call_soon_threadsafe(lambda: drained.done() or drained.set_result(True))
+
+        self.queue.add_drain_waiter(waiter)
+        await drained
+
+    @property
+    def full(self):
+        return self.queue.overflow == 'block' and not self.queue.released and self.queue.full
+
+    def release(self):
+        self.queue.release()
+
+    @property
+    def dropped_lines(self):
+        return self.queue.dropped_lines
+
+    @property
+    def dropped_bytes(self):
+        return self.queue.dropped_bytes
 
     @property
     def closed(self):
@@ -130,7 +438,7 @@ class stream:
 
     @property
     def empty(self):
-        return not self.lines and self.queue.empty()
+        return not self.lines and self.queue.empty() and not self.pending
 
     def __bool__(self):
         return not self.empty
@@ -149,6 +457,18 @@ class stream:
                     break
                 yield line
 
+    async def __aiter__(self):
+        if self.closed:
+            for line in self.lines:
+                yield line
+
+        else:
+            while True:
+                line = await self.areadline()
+                if line is None:
+                    break
+                yield line
+
 
 class IntegerEvent(threading.Event):
     def __init__(self, *args, **kwargs):
@@ -172,14 +492,268 @@ class IntegerEvent(threading.Event):
         return self.value == other
 
 
+class LineDecoder:
+    def __init__(self, encoding, rstrip):
+        self.rstrip = rstrip
+        self.tail = ''
+        self.decoder = io.IncrementalNewlineDecoder(
+                codecs.getincrementaldecoder(encoding)(errors='backslashreplace'),
+                translate=True)
+
+    def decode(self, data):
+        lines = (self.tail + self.decoder.decode(data, final=not data)).split('\n')
+        self.tail = lines.pop()
+        ret = [(line + '\n').rstrip(self.rstrip) for line in lines]
+        if not data and self.tail:
+            ret.append(self.tail.rstrip(self.rstrip))
+        return ret
+
+
+class EngineReader:
+    def __init__(self, engine, cmd, self_stream, proc_stream):
+        self.engine = engine
+        self.cmd = cmd
+        self.stream = self_stream
+        self.proc_stream = proc_stream
+        self.fd = proc_stream.fileno()
+        os.set_blocking(self.fd, False)
+
+        if cmd.encoding == False:
+            self.decoder = None
+            self.zerocopy = cmd.zerocopy
+            self.view = memoryview(bytearray(cmd.bufsize if cmd.bufsize > 1 else engine.chunksize))
+        else:
+            self.decoder = LineDecoder(cmd.encoding, cmd.rstrip)
+
+    def attach(self):
+        self.engine.selector.register(self.fd, selectors.EVENT_READ, self)
+
+    def __call__(self, events):
+        if self.decoder is None:
+            n = self.proc_stream.readinto(self.view)
+            if n is None:
+                return
+            if n:
+                write_chunk(self.stream, self.view[:n], self.zerocopy, force=True)
+                self.throttle()
+                return
+
+        else:
+            try:
+                data = os.read(self.fd, self.engine.chunksize)
+            except BlockingIOError:
+                return
+
+            if self.stream.batch:
+                self.stream.write_batch(self.decoder.decode(data), force=True)
+            else:
+                for line in self.decoder.decode(data):
+                    self.stream.writeline(line, force=True)
+            if data:
+                self.throttle()
+                return
+
+        self.abort()
+
+    def throttle(self):
+        # Stop reading until the stream is drained, the child blocks on the pipe
+        if self.stream.full:
+            self.engine.unregister(self.fd)
+            self.stream.queue.add_drain_waiter(self.resume)
+
+    def resume(self):
+        self.engine.call_soon(self.reattach)
+
+    def reattach(self):
+        if not self.proc_stream.closed:
+            self.attach()
+
+    def abort(self):
+        self.engine.unregister(self.fd)
+        self.stream.close()
+        self.proc_stream.close()
+
+
+class EngineWriter:
+    def __init__(self, engine, cmd, self_stream, proc_stream):
+        self.engine = engine
+        self.cmd = cmd
+        self.stream = self_stream
+        self.proc_stream = proc_stream
+        self.fd = proc_stream.fileno()
+        os.set_blocking(self.fd, False)
+
+        self.encoding = cmd.encoding
+        self.buffer = bytearray()
+        self.registered = False
+        self.closing = False
+        self.scheduled = False
+
+    def attach(self):
+        self.stream.waker = self.wakeup
+        self.pull()
+
+    def wakeup(self):
+        if not self.scheduled:
+            self.scheduled = True
+            self.engine.call_soon(self.pull)
+
+    def pull(self):
+        self.scheduled = False
+        while not self.closing:
+            try:
+                line = self.stream.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if line is None:
+                self.closing = True
+                continue
+
+            for line in (line if isinstance(line, Batch) else [line]):
+                if self.encoding == False or isinstance(line, (bytes, bytearray)):
+                    self.buffer += line
+                else:
+                    self.buffer += (line + '\n').encode(self.encoding, errors='backslashreplace')
+
+        self.flush()
+
+    def __call__(self, events):
+        self.flush()
+
+    def flush(self):
+        if self.proc_stream.closed:
+            return
+
+        if self.buffer:
+            try:
+                del self.buffer[:os.write(self.fd, self.buffer)]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self.buffer.clear()
+                self.closing = True
+
+        if self.buffer and not self.registered:
+            self.engine.selector.register(self.fd, selectors.EVENT_WRITE, self)
+            self.registered = True
+        elif not self.buffer and self.registered:
+            self.engine.unregister(self.fd)
+            self.registered = False
+
+        if not self.buffer and self.closing:
+            self.abort()
+
+    def abort(self):
+        if self.registered:
+            self.engine.unregister(self.fd)
+            self.registered = False
+        self.stream.waker = None
+        self.proc_stream.close()
+
+
+@export
+class IOEngine:
+    def __init__(self, chunksize=DEFAULT_CHUNKSIZE):
+        self.chunksize = chunksize
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.pending = []
+        self.thread = None
+
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        os.set_blocking(self.wakeup_r, False)
+        os.set_blocking(self.wakeup_w, False)
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ, None)
+
+    def call_soon(self, func, *args):
+        with self.lock:
+            self.pending.append((func, args))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.loop)
+                self.thread.daemon = True
+                self.thread.start()
+
+        try:
+            os.write(self.wakeup_w, b'\0')
+        except BlockingIOError: # pragma: no cover
+            pass
+
+    def attach(self, cmd):
+        for (worker, self_stream, proc_stream) in (
+                (EngineWriter, cmd.stdin, cmd.proc.stdin),
+                (EngineReader, cmd.stdout, cmd.proc.stdout),
+                (EngineReader, cmd.stderr, cmd.proc.stderr),
+                ):
+            if self_stream is not None and proc_stream is not None:
+                self.call_soon(worker(self, cmd, self_stream, proc_stream).attach)
+
+    def unregister(self, fd):
+        try:
+            self.selector.unregister(fd)
+        except KeyError: # pragma: no cover
+            pass
+
+    def dispatch(self, func, *args):
+        # A broken stream should not stop the engine for other commands,
+        # the exception is raised from wait() of its command instead
+        try:
+            func(*args)
+        except Exception as e:
+            worker = getattr(func, '__self__', func)
+            if worker.cmd.io_exception is None:
+                worker.cmd.io_exception = e
+            worker.abort()
+
+    def loop(self):
+        while True:
+            for key, events in self.selector.select():
+                if key.data is None:
+                    try:
+                        while os.read(self.wakeup_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self.dispatch(key.data, events)
+
+            with self.lock:
+                pending, self.pending = self.pending, []
+
+            for func, args in pending:
+                self.dispatch(func, *args)
+
+
+_io_engine = None
+
+def get_io_engine(engine):
+    global _io_engine
+    if isinstance(engine, IOEngine):
+        return engine
+
+    if engine == 'selector':
+        if _io_engine is None:
+            _io_engine = IOEngine()
+        return _io_engine
+
+    if engine in (None, 'thread'):
+        return None
+
+    raise ValueError('Invalid engine: ' + repr(engine))
+
+
 @export
 class command:
     def __init__(self, cmd, *,
                  cwd=None,
                  stdin=None, stdout=True, stderr=True,
                  encoding='utf8', rstrip='\r\n',
+                 batch=False,
+                 maxlines=None, maxbytes=None, overflow='block',
                  bufsize=-1,
-                 env=None):
+                 zerocopy=False,
+                 env=None,
+                 engine=None):
 
         if cmd and isinstance(cmd, str):
             cmd = [cmd]
@@ -200,13 +774,18 @@ class command:
 
         self.encoding = encoding
         self.bufsize = bufsize
+        self.zerocopy = zerocopy
         self.rstrip = rstrip
+        self.engine = get_io_engine(engine)
 
         self.cwd = cwd
         self.env = env
         self.proc = None
         self.thread = None
+        self.task = None
+        self.finished = threading.Event()
         self.exception = None
+        self.io_exception = None
         self.signaled = IntegerEvent()
         self.returncode = None
 
@@ -231,7 +810,7 @@ class command:
                 self.stdin_autoclose = True
 
         # Initialize stdout stream
-        self.stdout = stream()
+        self.stdout = stream(maxlines=maxlines, maxbytes=maxbytes, overflow=overflow)
         if stdout is None:
             self.proc_stdout = None
             self.stdout.close()
@@ -243,8 +822,11 @@ class command:
             self.stdout.keep = False
             self.stdout.welcome(stdout)
 
+        self.stdout.batch = batch
+
         # Initialize stderr stream
-        self.stderr = stream()
+        self.stderr = stream(maxlines=maxlines, maxbytes=maxbytes, overflow=overflow)
+        self.stderr.batch = batch
         if stderr is None:
             self.proc_stderr = None
             self.stderr.close()
@@ -264,6 +846,8 @@ class command:
 
     @property
     def alive(self):
+        if self.task:
+            return not self.finished.is_set()
         if self.proc:
             return self.proc.poll() is None
         if self.thread:
@@ -285,11 +869,154 @@ class command:
         self.stderr.close()
         self.wait()
 
+    async def __aenter__(self):
+        return await self.arun(wait=False)
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.stdin.close()
+        self.stdout.close()
+        self.stderr.close()
+        await self
+
+    def __await__(self):
+        return self.async_wait().__await__()
+
+    async def async_wait(self, timeout=None):
+        import asyncio
+        if timeout is True:
+            timeout = None
+        elif timeout is False:
+            return not self.alive
+
+        if self.task:
+            try:
+                await asyncio.wait_for(asyncio.shield(self.task), timeout)
+            except asyncio.TimeoutError:
+                return False
+            if self.exception:
+                raise self.exception
+            return True
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.wait, timeout)
+
+    async def arun(self, wait=None):
+        import asyncio
+
+        if wait is not None and not isinstance(wait, (int, bool, float)):
+            raise TypeError('The type of "wait" should be NoneType, int, bool, or float')
+
+        if self.proc or self.thread or self.task:
+            raise AlreadyRunningError(self)
+
+        if callable(self.cmd[0]) and not asyncio.iscoroutinefunction(self.cmd[0]):
+            self.run(wait=False)
+            await self.async_wait(wait)
+            return self
+
+        if callable(self.cmd[0]):
+            async def main():
+                try:
+                    self.returncode = await self.cmd[0](self, *self.cmd[1:])
+                except Exception as e:
+                    self.exception = e
+
+                self.stdin.close()
+                self.stdout.close()
+                self.stderr.close()
+
+        else:
+            self.proc = await asyncio.create_subprocess_exec(
+                    *self.cmd, cwd=self.cwd,
+                    stdin=self.proc_stdin,
+                    stdout=self.proc_stdout,
+                    stderr=self.proc_stderr,
+                    env=self.env)
+
+            async def writer(self_stream, proc_stream):
+                try:
+                    async for line in self_stream:
+                        if self.encoding == False or isinstance(line, (bytes, bytearray)):
+                            proc_stream.write(line)
+                        else:
+                            proc_stream.write((line + '\n').encode(self.encoding, errors='backslashreplace'))
+                        await proc_stream.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                proc_stream.close()
+
+            async def reader(self_stream, proc_stream):
+                if self.encoding == False:
+                    chunksize = self.bufsize if self.bufsize > 1 else DEFAULT_CHUNKSIZE
+                    while True:
+                        data = await proc_stream.read(chunksize)
+                        if not data:
+                            break
+                        write_chunk(self_stream, memoryview(data), self.zerocopy, force=True)
+                        if self_stream.full:
+                            await self_stream.adrain()
+
+                else:
+                    decoder = LineDecoder(self.encoding, self.rstrip)
+                    while True:
+                        data = await proc_stream.read(DEFAULT_CHUNKSIZE)
+                        if self_stream.batch:
+                            self_stream.write_batch(decoder.decode(data), force=True)
+                        else:
+                            for line in decoder.decode(data):
+                                self_stream.writeline(line, force=True)
+                        if not data:
+                            break
+                        if self_stream.full:
+                            await self_stream.adrain()
+
+                self_stream.close()
+
+            io_tasks = [worker(self_stream, proc_stream)
+                        for (worker, self_stream, proc_stream) in (
+                            (writer, self.stdin, self.proc.stdin),
+                            (reader, self.stdout, self.proc.stdout),
+                            (reader, self.stderr, self.proc.stderr),
+                            )
+                        if proc_stream is not None]
+
+            async def main():
+                await asyncio.gather(*io_tasks)
+                self.returncode = await self.proc.wait()
+
+        async def supervisor():
+            try:
+                await main()
+            finally:
+                _children.discard(self)
+                self.finished.set()
+
+        self.task = asyncio.ensure_future(supervisor())
+        _children.append(self)
+
+        # Pull data from stdin_queue and feed into stdin stream
+        if self.stdin_queue:
+            def feeder():
+                while True:
+                    self.stdin.writeline(self.stdin_queue.get())
+                    self.stdin_queue.task_done()
+
+            t = threading.Thread(target=feeder)
+            t.daemon = True
+            t.start()
+
+        elif self.stdin_autoclose:
+            self.stdin.close()
+
+        await self.async_wait(wait)
+
+        return self
+
     def run(self, wait=None):
         if wait is not None and not isinstance(wait, (int, bool, float)):
             raise TypeError('The type of "wait" should be NoneType, int, bool, or float')
 
-        if self.proc or self.thread:
+        if self.proc or self.thread or self.task:
             raise AlreadyRunningError(self)
 
         if callable(self.cmd[0]):
@@ -308,6 +1035,16 @@ class command:
             self.thread.start()
             _children.append(self)
 
+        elif self.engine:
+            self.proc = sub.Popen(
+                    self.cmd, cwd=self.cwd,
+                    stdin=self.proc_stdin,
+                    stdout=self.proc_stdout,
+                    stderr=self.proc_stderr,
+                    env=self.env, bufsize=0)
+            _children.append(self)
+            self.engine.attach(self)
+
         else:
             if self.encoding == False:
                 # binary mode
@@ -342,30 +1079,30 @@ class command:
                 proc_stream.close()
 
             def reader(self_stream, proc_stream):
-                if self.encoding != False:
+                if self.encoding != False and self_stream.batch:
+                    # text, deliver all lines available in each read
+                    decoder = LineDecoder(self.encoding, self.rstrip)
+                    while True:
+                        data = proc_stream.buffer.read1(DEFAULT_CHUNKSIZE)
+                        self_stream.write_batch(decoder.decode(data))
+                        if not data:
+                            break
+
+                elif self.encoding != False:
                     # text
                     for line in proc_stream:
                         line = line.rstrip(self.rstrip)
                         self_stream.writeline(line)
 
                 else:
-                    # binary
-                    while self.poll() is None:
-                        data = proc_stream.read(
-                                -1
-                                if self.bufsize < 0
-                                else (self.bufsize or 1)
-                                )
-
-                        if not data:
-                            continue
-
-                        self_stream.write(data)
-
-                    # Read all remaining data left in stream
-                    data = proc_stream.read()
-                    if data:
-                        self_stream.writeline(data)
+                    # binary, read into a reusable buffer until EOF
+                    view = memoryview(bytearray(self.bufsize if self.bufsize > 1 else DEFAULT_CHUNKSIZE))
+                    readinto = getattr(proc_stream, 'readinto1', proc_stream.readinto)
+                    while True:
+                        n = readinto(view)
+                        if not n:
+                            break
+                        write_chunk(self_stream, view[:n], self.zerocopy)
 
                 self_stream.close()
                 proc_stream.close()
@@ -400,6 +1137,8 @@ class command:
         return self
 
     def poll(self):
+        if self.task:
+            return self.returncode
         if self.proc:
             return self.proc.poll()
         if self.thread:
@@ -413,9 +1152,17 @@ class command:
             return not self.alive
 
         # Wait too early
-        if self.proc is None and self.thread is None:
+        if self.proc is None and self.thread is None and self.task is None:
             return False
 
+        # Started by arun(), don't call this in the event loop thread
+        if self.task:
+            if not self.finished.wait(timeout):
+                return False
+            if self.exception:
+                raise self.exception
+            return True
+
         # Wait for child process to finish
         if self.proc:
             self.exception = None
@@ -441,6 +1188,11 @@ class command:
         if self.exception:
             raise self.exception
 
+        # The rest of output from a killed process would never be consumed
+        if self.signaled.is_set():
+            self.stdout.release()
+            self.stderr.release()
+
         # Wait for all streams to close
         self.stdin.eof.wait()
         self.stdout.eof.wait()
@@ -450,6 +1202,9 @@ class command:
         for t in self.io_threads:
             t.join()
 
+        if self.io_exception:
+            raise self.io_exception
+
         return True
 
     def signal(self, signal):
@@ -461,28 +1216,67 @@ class command:
 
     def kill(self, signal=SIGTERM):
         self.signal(signal)
+        if self.task:
+            self.stdout.release()
+            self.stderr.release()
+            return
         if self.proc:
             self.wait()
         if self.thread:
             self.thread.join()
 
 
+def unconsumed_overflow(overflow):
+    # Nothing can read the streams before run() returns, blocking would deadlock
+    return 'drop-oldest' if overflow == 'block' else overflow
+
+
 @export
 def run(cmd, *,
         cwd=None,
         stdin=None, stdout=True, stderr=True,
         encoding='utf8', rstrip='\r\n',
+        batch=False,
+        maxlines=None, maxbytes=None, overflow='block',
         bufsize=-1,
+        zerocopy=False,
         env=None,
+        engine=None,
         wait=True):
+    if wait is None or wait is True:
+        overflow = unconsumed_overflow(overflow)
     ret = command(cmd, cwd=cwd,
                   stdin=stdin, stdout=stdout, stderr=stderr,
-                  encoding=encoding,
-                  rstrip=rstrip, env=env)
+                  encoding=encoding, rstrip=rstrip, batch=batch,
+                  maxlines=maxlines, maxbytes=maxbytes, overflow=overflow,
+                  bufsize=bufsize, zerocopy=zerocopy,
+                  env=env, engine=engine)
     ret.run(wait=wait)
     return ret
 
 
+@export
+async def arun(cmd, *,
+               cwd=None,
+               stdin=None, stdout=True, stderr=True,
+               encoding='utf8', rstrip='\r\n',
+               batch=False,
+               maxlines=None, maxbytes=None, overflow='block',
+               bufsize=-1,
+               zerocopy=False,
+               env=None,
+               wait=True):
+    if wait is None or wait is True:
+        overflow = unconsumed_overflow(overflow)
+    ret = command(cmd, cwd=cwd,
+                  stdin=stdin, stdout=stdout, stderr=stderr,
+                  encoding=encoding, rstrip=rstrip, batch=batch,
+                  maxlines=maxlines, maxbytes=maxbytes, overflow=overflow,
+                  bufsize=bufsize, zerocopy=zerocopy,
+                  env=env)
+    return await ret.arun(wait=wait)
+
+
 class Pipe:
     def __init__(self, istream, *ostreams):
         if istream.closed:
@@ -500,9 +1294,9 @@ class Pipe:
 
     def main(self):
         try:
-            for line in self.istream:
+            for batch in self.istream.batches():
                 for ostream in self.ostreams:
-                    ostream.write(line)
+                    ostream.write_batch(batch)
                 if self.post_write:
                     self.post_write()
 
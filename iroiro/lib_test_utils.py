@@ -277,7 +277,7 @@ class FakeTerminal:
 
     def ensure_cursor_pos(self):
         from .lib_math import clamp
-        self.cursor.y = clamp(0, self.cursor.y, self.height or self.cursor.y)
+        self.cursor.y = clamp(0, self.cursor.y, (self.height - 1) if self.height else self.cursor.y)
         self.cursor.x = clamp(0, self.cursor.x, self.width or self.cursor.x)
 
         # Ensure canvas has enough lines
@@ -349,9 +349,13 @@ class FakeTerminal:
             self.cursor.x = 0
 
         elif self.chewing == '\n':
-            # Newline
+            # Newline, scroll up at the bottom line
             self.cursor.x = 0
-            self.cursor.y += 1
+            if self.height and self.cursor.y >= self.height - 1:
+                self.canvas.pop(0)
+                self.canvas.append([])
+            else:
+                self.cursor.y += 1
 
         elif m.fullmatch('\033' + r'\[(\d*)([AB])'):
             # move cursor up/down
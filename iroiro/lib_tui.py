@@ -1,21 +1,55 @@
 import sys
+import bisect
+import collections
+import functools
+import itertools
 
 from .lib_itertools import zip_longest, flatten
 
 from .internal_utils import exporter
 export, __all__ = exporter()
 
+from .internal_widths import width_table
+_width_table_firsts = tuple(first for first, last, width in width_table)
+
 
 @export
+@functools.lru_cache(maxsize=4096)
 def charwidth(c):
-    import unicodedata
-    return 1 + (unicodedata.east_asian_width(c) in 'WF')
+    o = ord(c)
+    idx = bisect.bisect_right(_width_table_firsts, o) - 1
+    if idx >= 0:
+        first, last, width = width_table[idx]
+        if o <= last:
+            return width
+    return 1
 
 
 @export
 def strwidth(s):
-    from .lib_colors import decolor
-    return sum(charwidth(c) for c in decolor(s))
+    if s.isascii() and '\033' not in s:
+        return len(s)
+    return _strwidth(s)
+
+
+@functools.lru_cache(maxsize=4096)
+def _strwidth(s):
+    if '\033' in s:
+        from .lib_colors import decolor
+        s = decolor(s)
+
+    if s.isascii():
+        return len(s)
+
+    ret = sum(map(charwidth, s))
+
+    # Emoji presentation selector widens the previous char
+    idx = s.find('\ufe0f', 1)
+    while idx > 0:
+        ret += (charwidth(s[idx - 1]) == 1)
+        idx = s.find('\ufe0f', idx + 1)
+
+    return ret
 
 
 @export
@@ -25,6 +59,10 @@ def wrap(s, width, clip=None):
     elif not isinstance(clip, str) or (len(clip) != 1) or (charwidth(clip) != 1):
         raise ValueError('clip should be a single width char')
 
+    if s.isascii():
+        width = max(0, int(width))
+        return (s[:width], s[width:])
+
     w = 0
     for idx, char in enumerate(s):
         cw = charwidth(char)
@@ -36,76 +74,177 @@ def wrap(s, width, clip=None):
     return (s, '')
 
 
-def lpad(text, padding):
-    return text + padding
-
-
-def rpad(text, padding):
-    return padding + text
-
-
-def just_elem(func):
-    def wrapper(elem, width, fillchar):
-        row, col, text = elem
-        padding = (width - strwidth(text)) * fillchar(row=row, col=col, text=text)
-        return func(text, padding)
-    return wrapper
-
+def sgr_styled(seq, styled=False):
+    # Whether a style is still active after the SGR sequence
+    tokens = iter(seq[2:-1].split(';'))
+    for token in tokens:
+        if token in ('', '0'):
+            styled = False
+            continue
 
-def just_generator(just_func, data, width, fillchar):
-    for row, vector in enumerate(data):
-        if isinstance(width, int):
-            width = (width,) * len(vector)
-        yield tuple(
-                just_func((row, col, text), w, fillchar)
-                for col, (text, w) in enumerate(zip_longest(vector, width[:len(vector)], fillvalues=('', 0)))
-                )
+        styled = True
+        if token in ('38', '48'):
+            mode = next(tokens, None)
+            for i in range({'5': 1, '2': 3}.get(mode, 0)):
+                next(tokens, None)
+    return styled
+
+
+def clip(s, width):
+    if '\033' not in s:
+        return wrap(s, width)[0]
+
+    from .lib_colors import color_esc_seq_regex
+    pos = 0
+    styled = False
+    for m in itertools.chain(color_esc_seq_regex.finditer(s), (None,)):
+        end = len(s) if m is None else m.start()
+        head, tail = wrap(s[pos:end], width)
+        if tail:
+            return s[:pos] + head + ('\033[m' if styled else '')
+        width -= strwidth(head)
+        if m is None:
+            break
+        styled = sgr_styled(m.group(), styled)
+        pos = m.end()
+    return s
 
 
-def just(just_func, data, width, fillchar):
-    if not callable(fillchar):
-        _fillchar = fillchar
-        fillchar = lambda row, col, text: _fillchar
+@export
+class Table:
+    def __init__(self, rows=None, width=None, fillchar=' ', truncate=False):
+        # Fixed width: each row keeps its own column count
+        # Auto width: all rows are padded to the widest row
+        self.width = width or None
+        self.widths = []
+        self.locked = self.width is not None
+        self.fillchar = fillchar
+        self.truncate = truncate
+        self.rows = []
+
+        if rows is not None:
+            self.extend(rows)
+
+    def measure(self, row):
+        cells = tuple((text, strwidth(text)) for text in row)
+
+        if not self.locked:
+            widths = self.widths
+            for col, (text, w) in enumerate(cells):
+                if col >= len(widths):
+                    widths.append(w)
+                elif w > widths[col]:
+                    widths[col] = w
+
+        return cells
+
+    def append(self, row):
+        self.rows.append(self.measure(row))
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def lock(self):
+        self.locked = True
 
+    def __len__(self):
+        return len(self.rows)
+
+    def column_widths(self, ncols):
+        if self.width is None:
+            return self.widths
+        if isinstance(self.width, int):
+            return (self.width,) * ncols
+        return self.width[:ncols]
+
+    def paddings(self, idx, cells):
+        widths = self.column_widths(len(cells))
+        if len(cells) < len(widths):
+            cells = cells + (('', 0),) * (len(widths) - len(cells))
+
+        fillchar = self.fillchar
+        for col, (text, w) in enumerate(cells):
+            # Columns without width overflow
+            width = widths[col] if col < len(widths) else w
+            if w > width and self.truncate:
+                text = clip(text, width)
+                w = strwidth(text)
+
+            if callable(self.fillchar):
+                fillchar = self.fillchar(row=idx, col=col, text=text)
+            yield (text, (width - w) * fillchar)
+
+    def pad(self, idx, cells, rjust=False):
+        if rjust:
+            return tuple(padding + text for text, padding in self.paddings(idx, cells))
+        return tuple(text + padding for text, padding in self.paddings(idx, cells))
+
+    def ljust(self):
+        return [self.pad(idx, cells) for idx, cells in enumerate(self.rows)]
+
+    def rjust(self):
+        return [self.pad(idx, cells, rjust=True) for idx, cells in enumerate(self.rows)]
+
+    def render_row(self, idx, cells, sep=' ', rjust=False):
+        line = []
+        for text, padding in self.paddings(idx, cells):
+            line += (sep, padding, text) if rjust else (sep, text, padding)
+        return ''.join(line[1:])
+
+    def render(self, sep=' ', rjust=False):
+        return [self.render_row(idx, cells, sep=sep, rjust=rjust)
+                for idx, cells in enumerate(self.rows)]
+
+    def stream(self, rows, sample=None, rjust=False):
+        rows = iter(rows)
+
+        # Measure the sampled rows (or all rows) to decide column widths
+        if not self.locked:
+            self.extend(itertools.islice(rows, sample))
+            self.lock()
+
+        buffered, self.rows = self.rows, []
+        for idx, cells in enumerate(buffered):
+            yield self.pad(idx, cells, rjust=rjust)
+
+        for idx, row in enumerate(rows, len(buffered)):
+            yield self.pad(idx, self.measure(row), rjust=rjust)
+
+
+def just(data, width, fillchar, sample, truncate, rjust):
     if isinstance(data, str):
-        return just_func((0, 0, data), width, fillchar)
-
-    if width:
+        if truncate:
+            data = clip(data, width)
+        if callable(fillchar):
+            fillchar = fillchar(row=0, col=0, text=data)
+        padding = (width - strwidth(data)) * fillchar
+        return padding + data if rjust else data + padding
+
+    if width or sample:
+        table = Table(width=width, fillchar=fillchar, truncate=truncate)
+        ret = table.stream(data, sample=sample, rjust=rjust)
         if isinstance(data, (tuple, list)):
-            t = type(data)
-        else:
-            t = lambda x: x
-        return t(just_generator(just_func, data, width, fillchar))
-
-    maxwidth = []
-    for vector in data:
-        maxwidth = [
-                max(w, strwidth(text))
-                for text, w in zip_longest(vector, maxwidth, fillvalues=('', 0))
-                ]
-
-    return [
-            tuple(
-                just_func((row, col, text), w, fillchar)
-                for col, (text, w) in enumerate(zip_longest(vector, maxwidth, fillvalues=('', 0)))
-                )
-            for row, vector in enumerate(data)
-            ]
+            return type(data)(ret)
+        return ret
+
+    table = Table(data, fillchar=fillchar, truncate=truncate)
+    return table.rjust() if rjust else table.ljust()
 
 
 @export
-def ljust(data, width=None, fillchar=' '):
-    return just(just_elem(lpad), data, width, fillchar)
+def ljust(data, width=None, fillchar=' ', sample=None, truncate=False):
+    return just(data, width, fillchar, sample, truncate, rjust=False)
 
 
 @export
-def rjust(data, width=None, fillchar=' '):
-    return just(just_elem(rpad), data, width, fillchar)
+def rjust(data, width=None, fillchar=' ', sample=None, truncate=False):
+    return just(data, width, fillchar, sample, truncate, rjust=True)
 
 
 @export
 class ThreadedSpinner:
-    def __init__(self, *icon, delay=0.1):
+    def __init__(self, *icon, delay=0.1, animator=None):
         if not icon:
             self.icon_entry = '⠉⠛⠿⣿⠿⠛⠉⠙'
             self.icon_loop = '⠹⢸⣰⣤⣆⡇⠏⠛'
@@ -139,6 +278,10 @@ class ThreadedSpinner:
         self.thread = None
         self._text = ''
 
+        import threading
+        self.animator = animator
+        self.finished = threading.Event()
+
         import itertools
         self.icon_iter = (
                 itertools.chain(
@@ -174,12 +317,30 @@ class ThreadedSpinner:
             return self._text
 
         self._text = ' '.join(str(a) for a in args)
-        if self.thread:
+        if self.running:
             self.refresh()
+        elif self.animator is not None:
+            self.animator.update(self)
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def line(self):
+        return self.icon + ' ' + self._text
 
     def refresh(self):
         self.print('\r' + self.icon + '\033[K ' + self._text, end='')
 
+    def advance(self):
+        # Return False after the leave sequence is finished
+        idx = self.is_end
+        try:
+            self.icon_head[idx] = next(self.icon_iter[idx])
+            return True
+        except StopIteration:
+            return False
+
     def animate(self):
         import time
 
@@ -202,6 +363,10 @@ class ThreadedSpinner:
         if self.thread:
             return
 
+        if self.animator is not None:
+            self.animator.add(self)
+            return
+
         import threading
         self.thread = threading.Thread(target=self.animate)
         self.thread.daemon = True
@@ -213,7 +378,295 @@ class ThreadedSpinner:
             self.join()
 
     def join(self):
-        self.thread.join()
+        if self.animator is not None:
+            # Nothing would finish the spinner if it's not animated
+            with self.animator.lock:
+                animated = self in self.animator.spinners and self.animator.thread is not None
+            if animated:
+                self.finished.wait()
+        elif self.thread:
+            self.thread.join()
+
+
+@export
+class SpinnerAnimator:
+    def __init__(self, canvas=None, delay=0.05):
+        self.canvas = PseudoCanvas() if canvas is None else canvas
+        self.delay = delay
+
+        # Spinner -> [line index, next frame time]
+        self.spinners = {}
+
+        import threading
+        self.lock = threading.Lock()
+        self.thread = None
+        self.is_end = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def add(self, spinner):
+        with self.lock:
+            if spinner in self.spinners:
+                return
+            self.spinners[spinner] = [len(self.canvas), 0]
+            self.canvas.append(spinner.line())
+
+    def update(self, spinner):
+        with self.lock:
+            if spinner in self.spinners:
+                self.canvas[self.spinners[spinner][0]] = spinner.line()
+
+    def tick(self, now=None):
+        import time
+        if now is None:
+            now = time.monotonic()
+
+        with self.lock:
+            for spinner, state in list(self.spinners.items()):
+                idx, next_frame = state
+                if now < next_frame:
+                    continue
+
+                self.canvas[idx] = spinner.line()
+                state[1] = now + spinner.delay
+                if not spinner.advance():
+                    # join() checks both under the lock
+                    del self.spinners[spinner]
+                    spinner.finished.set()
+
+        # All spinners are drawn in one write
+        self.canvas.render()
+
+    def run(self):
+        while not self.is_end.is_set():
+            self.tick()
+            self.is_end.wait(self.delay)
+        self.tick()
+
+    def start(self):
+        with self.lock:
+            if self.thread:
+                return
+
+            import threading
+            self.is_end.clear()
+            self.thread = threading.Thread(target=self.run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self, wait=True):
+        # Finish all spinners before leaving
+        with self.lock:
+            spinners = list(self.spinners)
+        for spinner in spinners:
+            spinner.end(wait=False)
+        if wait:
+            for spinner in spinners:
+                spinner.join()
+
+        self.is_end.set()
+        if wait and self.thread:
+            self.thread.join()
+            self.thread = None
+
+        if self.canvas.frames:
+            self.canvas.print()
+
+
+@export
+class AsyncSpinner(ThreadedSpinner):
+    def __init__(self, *icon, delay=0.1):
+        super().__init__(*icon, delay=delay)
+        self.task = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aend()
+
+    @property
+    def running(self):
+        return self.task is not None
+
+    async def animate(self):
+        import asyncio
+
+        while not self.is_end:
+            self.refresh()
+            await asyncio.sleep(self.delay)
+            self.icon_head[0] = next(self.icon_iter[0])
+
+        while True:
+            self.refresh()
+            if not self.advance():
+                break
+            await asyncio.sleep(self.delay)
+
+        self.print()
+
+    def start(self):
+        if self.task:
+            return
+
+        import asyncio
+        self.task = asyncio.ensure_future(self.animate())
+
+    def join(self):
+        if self.task is None or self.task.done():
+            return
+        raise RuntimeError('AsyncSpinner is animated by the event loop, use "await ajoin()"')
+
+    async def aend(self, wait=True):
+        self.is_end = True
+        if wait:
+            await self.ajoin()
+
+    async def ajoin(self):
+        if self.task is None:
+            return
+        await self.task
+
+
+def format_duration(secs):
+    secs = int(secs)
+    if secs >= 3600:
+        return '{}:{:02}:{:02}'.format(secs // 3600, secs // 60 % 60, secs % 60)
+    return '{}:{:02}'.format(secs // 60, secs % 60)
+
+
+@export
+class ProgressBar:
+    def __init__(self, total=None, *, width=20, delay=0.1):
+        self.total = total
+        self.width = width
+        self.delay = delay
+        self.count = 0
+        self._text = ''
+
+        self.start_time = None
+        self.last_refresh = None
+        self.task = None
+        self.closed = False
+
+        import builtins
+        self.print = builtins.print
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def __aenter__(self):
+        self.start()
+
+        # Keep rate and ETA updated even if no progress is made
+        import asyncio
+        self.task = asyncio.ensure_future(self.tick())
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+        await self.task
+
+    async def tick(self):
+        import asyncio
+        while not self.closed:
+            await asyncio.sleep(self.delay)
+            if not self.closed:
+                self.refresh()
+
+    def start(self):
+        import time
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+
+    def text(self, *args):
+        if not args:
+            return self._text
+        self._text = ' '.join(str(a) for a in args)
+
+    @property
+    def elapsed(self):
+        import time
+        if self.start_time is None:
+            return 0
+        return time.monotonic() - self.start_time
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.count / elapsed if elapsed > 0 else 0
+
+    @property
+    def eta(self):
+        rate = self.rate
+        if self.total is None or not rate:
+            return None
+        return max(0, self.total - self.count) / rate
+
+    def update(self, n=1):
+        import time
+        self.start()
+        self.count += n
+
+        # Redraw at most once per delay
+        now = time.monotonic()
+        if self.last_refresh is None or now - self.last_refresh >= self.delay:
+            self.refresh()
+
+    def line(self):
+        ret = []
+        if self.total:
+            ratio = min(1, self.count / self.total)
+            filled = int(ratio * self.width)
+            ret.append('[' + '#' * filled + '-' * (self.width - filled) + ']')
+            ret.append('{}/{}'.format(self.count, self.total))
+        else:
+            ret.append(str(self.count))
+
+        ret.append('{:.1f}/s'.format(self.rate))
+
+        eta = self.eta
+        if eta is not None:
+            ret.append('ETA ' + format_duration(eta))
+
+        if self._text:
+            ret.append(self._text)
+
+        return ' '.join(ret)
+
+    def refresh(self):
+        import time
+        self.last_refresh = time.monotonic()
+        self.print('\r' + self.line() + '\033[K', end='')
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.refresh()
+        self.print()
+
+    def iter(self, iterable):
+        self.start()
+        for item in iterable:
+            yield item
+            self.update()
+
+    async def aiter(self, aiterable):
+        self.start()
+        async for item in aiterable:
+            yield item
+            self.update()
 
 
 def alt_if_none(A, B):
@@ -430,6 +883,9 @@ KEY_F10 = Key(b'\033[21~', 'F10')
 KEY_F11 = Key(b'\033[23~', 'F11')
 KEY_F12 = Key(b'\033[24~', 'F12')
 
+KEY_PASTE_START = Key(b'\033[200~', 'paste-start')
+KEY_PASTE_END = Key(b'\033[201~', 'paste-end')
+
 def _register_ctrl_n_keys():
     for c in 'abcdefghjklnopqrstuvwxyz':
         C = c.upper()
@@ -453,11 +909,37 @@ del _export_all_keys
 key_table = {}
 key_table_reverse = {}
 
+# Each node is [key, {byte: child}]
+key_trie = [None, {}]
+
+def _trie_insert(seq, key):
+    node = key_trie
+    for b in seq:
+        node = node[1].setdefault(b, [None, {}])
+    node[0] = key
+
+
+def _trie_remove(seq):
+    path = [key_trie]
+    for b in seq:
+        node = path[-1][1].get(b)
+        if node is None:
+            return
+        path.append(node)
+
+    path[-1][0] = None
+    for b, parent, node in reversed(list(zip(seq, path, path[1:]))):
+        if node[0] is not None or node[1]:
+            break
+        del parent[1][b]
+
+
 def _init_key_table():
     for k, v in globals().items():
         if not k.startswith('KEY_'):
             continue
         key_table[v.seq] = v
+        _trie_insert(v.seq, v)
 
         for alias in v.aliases:
             key_table_reverse[alias] = v
@@ -481,6 +963,7 @@ def register_key(seq, *aliases):
 
     if seq not in key_table:
         key_table[seq] = Key(seq, *aliases)
+        _trie_insert(seq, key_table[seq])
         return key_table[seq]
 
     key = key_table[seq]
@@ -496,92 +979,376 @@ def deregister_key(seq):
         seq = seq.seq
     elif isinstance(seq, str):
         seq = seq.encode('utf8')
+    _trie_remove(seq)
     return key_table.pop(seq, None)
 
 
+_getch_queue = collections.deque()
+_getch_encoding = None
+
+def _encode_key(key, encoding):
+    if isinstance(key, Key):
+        return key.seq
+    if isinstance(key, Paste):
+        return KEY_PASTE_START.seq + key.encode(encoding) + KEY_PASTE_END.seq
+    if isinstance(key, str):
+        return key.encode(encoding)
+    return key
+
+
 @export
-def getch(timeout=None, encoding='utf8'):
+def getch(timeout=None, encoding='utf8', esc_timeout=0.025):
+    global _getch_encoding
+
+    # Keys left from the previous read are decoded again if the encoding changed
+    if _getch_queue and encoding != _getch_encoding:
+        buf = b''.join(_encode_key(key, _getch_encoding) for key in _getch_queue)
+        _getch_queue.clear()
+        _getch_queue.extend(_decode_keys(buf, encoding)[0])
+    _getch_encoding = encoding
+
+    if _getch_queue:
+        return _getch_queue.popleft()
+
     import termios, tty
-    import os
-    import select
 
     fd = sys.stdin.fileno()
     orig_term_attr = termios.tcgetattr(fd)
     when = termios.TCSADRAIN
 
-    def has_data(t=0):
-        return select.select([fd], [], [], t)[0]
-
-    def read_one_byte():
-        return os.read(sys.stdin.fileno(), 1)
+    # Don't write the bracketed paste mode toggles into redirected output
+    paste = sys.stdout.isatty()
 
     try:
         tty.setraw(fd, when=when)
+        if paste:
+            print('\033[?2004h', end='', flush=True)
+
+        reader = KeyReader(fd, encoding=encoding, esc_timeout=esc_timeout)
+        reader.fill(timeout)
+        _getch_queue.extend(reader.queue)
+        return _getch_queue.popleft() if _getch_queue else None
+
+    finally:
+        if paste:
+            print('\033[?2004l', end='', flush=True)
+        termios.tcsetattr(fd, when, orig_term_attr)
+
+
+def _to_key(seq, encoding):
+    if seq in key_table:
+        return key_table[seq]
 
-        # Wait for input until timeout
-        if not has_data(timeout):
+    try:
+        return seq.decode(encoding)
+    except UnicodeError:
+        return seq
+
+
+def _match_key(buf, start, encoding, final=True):
+    node = key_trie
+    end = start
+    while end < len(buf):
+        node = node[1].get(buf[end])
+        end += 1
+        if node is None:
+            break
+        if not node[1]:
+            return end, node[0]
+    else:
+        if not final:
             return None
+        return end, _to_key(bytes(buf[start:end]), encoding)
+
+    while True:
+        try:
+            return end, bytes(buf[start:end]).decode(encoding)
+        except UnicodeError:
+            if end >= len(buf):
+                break
+            end += 1
+
+    if not final:
+        return None
+    return end, bytes(buf[start:end])
+
+
+@export
+class Paste(str):
+    def __repr__(self):
+        return type(self).__name__ + '({})'.format(super().__repr__())
+
+
+def _decode_keys(buf, encoding, final=True, scan=0):
+    # scan: where to resume searching for the end of a paste that starts buf
+    ret = []
+    i = 0
+    while i < len(buf):
+        match = _match_key(buf, i, encoding, final=final)
+        if match is None:
+            break
+
+        j, key = match
+        if isinstance(key, Key) and key.seq == KEY_PASTE_START.seq:
+            end = buf.find(KEY_PASTE_END.seq, max(j, scan) if i == 0 else j)
+            if end < 0 and not final:
+                break
+            end = len(buf) if end < 0 else end
+            key = Paste(bytes(buf[j:end]).decode(encoding, errors='replace'))
+            j = min(end + len(KEY_PASTE_END.seq), len(buf))
+
+        i = j
+        ret.append(key)
+
+    return ret, i
+
+
+@export
+class KeyReader:
+    def __init__(self, fd=None, encoding='utf8', bufsize=4096, esc_timeout=0.025, paste=False):
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        self.encoding = encoding
+        self.bufsize = bufsize
+        self.esc_timeout = esc_timeout
+        self.paste = paste
+        self.buffer = bytearray()
+        self.paste_scan = 0
+        self.queue = collections.deque()
+        self.orig_term_attr = None
+        self.eof = False
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def fileno(self):
+        return self.fd
+
+    def open(self):
+        import os
+        if self.orig_term_attr is None and os.isatty(self.fd):
+            import termios, tty
+            self.orig_term_attr = termios.tcgetattr(self.fd)
+            tty.setraw(self.fd, when=termios.TCSADRAIN)
+            if self.paste:
+                print('\033[?2004h', end='', flush=True)
+        return self
+
+    def close(self):
+        if self.orig_term_attr is not None:
+            import termios
+            if self.paste:
+                print('\033[?2004l', end='', flush=True)
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.orig_term_attr)
+            self.orig_term_attr = None
+
+    def fill(self, timeout=None):
+        import os
+        import select
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
 
-        acc = b''
-        candidate_matches = set(key_table.keys())
         while True:
-            acc += read_one_byte()
+            self.read_available()
 
-            if not has_data():
+            if not self.buffer:
                 break
 
-            # Still have chance to match in key table
-            if candidate_matches:
-                # eliminate potential matches
-                candidate_matches = set(key_seq for key_seq in candidate_matches if key_seq.startswith(acc))
+            # Wait a little longer for a partially received sequence, e.g. bare ESC
+            if not select.select([self.fd], [], [], self.esc_timeout)[0]:
+                self.decode(final=True)
+                break
 
-                # Perfect match, return
-                if candidate_matches == {acc}:
-                    break
+        return True
 
-                # multiple prefix matchs: collect more byte
-                if candidate_matches:
-                    continue
+    def read_available(self):
+        # The fd is readable, read until nothing is left
+        import os
+        import select
 
-            # Input sequence does not match anything in key table
-            # Collect enough bytes to decode at least one unicode char
-            try:
-                acc.decode(encoding)
+        while True:
+            data = os.read(self.fd, self.bufsize)
+            if not data:
+                self.eof = True
+            self.buffer += data
+            if self.eof or not select.select([self.fd], [], [], 0)[0]:
                 break
-            except UnicodeError:
+
+        self.decode(final=self.eof)
+
+    def decode(self, final=True):
+        keys, n = _decode_keys(self.buffer, self.encoding, final=final, scan=self.paste_scan)
+        self.queue.extend(keys)
+        del self.buffer[:n]
+
+        # An incomplete paste is left in the buffer, skip the part already searched
+        if self.buffer.startswith(KEY_PASTE_START.seq):
+            self.paste_scan = max(len(self.buffer) - len(KEY_PASTE_END.seq) + 1, 0)
+        else:
+            self.paste_scan = 0
+
+    def get(self, timeout=None):
+        if not self.queue and not self.eof:
+            self.fill(timeout)
+        return self.queue.popleft() if self.queue else None
+
+    def __iter__(self):
+        while True:
+            key = self.get()
+            if key is None:
+                return
+            yield key
+
+    async def aget(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while not self.queue and not self.eof:
+            # Wait a little longer for a partially received sequence, e.g. bare ESC
+            timeout = self.esc_timeout if self.buffer else None
+
+            readable = loop.create_future()
+            loop.add_reader(self.fd, lambda: readable.done() or readable.set_result(True))
+            try:
+                await asyncio.wait_for(readable, timeout)
+            except asyncio.TimeoutError:
+                self.decode(final=True)
                 continue
+            finally:
+                loop.remove_reader(self.fd)
+
+            self.read_available()
 
-        if acc in key_table:
-            return key_table[acc]
+        return self.queue.popleft() if self.queue else None
+
+    def __aiter__(self):
+        return self
 
+    async def __anext__(self):
+        key = await self.aget()
+        if key is None:
+            raise StopAsyncIteration
+        return key
+
+
+_sigwinch_count = 0
+_sigwinch_watchers = 0
+_sigwinch_prev_handler = None
+
+def _sigwinch_handler(signum, frame):
+    global _sigwinch_count
+    _sigwinch_count += 1
+    if callable(_sigwinch_prev_handler):
+        _sigwinch_prev_handler(signum, frame)
+
+
+def watch_terminal_size():
+    global _sigwinch_prev_handler, _sigwinch_watchers
+
+    import signal
+    if not hasattr(signal, 'SIGWINCH'): # pragma: no cover
+        return False
+
+    if signal.getsignal(signal.SIGWINCH) is not _sigwinch_handler:
         try:
-            return acc.decode(encoding)
-        except UnicodeError:
-            return acc
+            _sigwinch_prev_handler = signal.signal(signal.SIGWINCH, _sigwinch_handler)
+        except ValueError:
+            # Not in main thread
+            return False
 
-    finally:
-        termios.tcsetattr(fd, when, orig_term_attr)
+    _sigwinch_watchers += 1
+    return True
+
+
+def unwatch_terminal_size():
+    global _sigwinch_watchers
+
+    import signal
+    if not hasattr(signal, 'SIGWINCH'): # pragma: no cover
+        return
+
+    # Restore the previous handler after the last watcher is gone
+    _sigwinch_watchers = max(0, _sigwinch_watchers - 1)
+    if _sigwinch_watchers or signal.getsignal(signal.SIGWINCH) is not _sigwinch_handler:
+        return
+
+    try:
+        signal.signal(signal.SIGWINCH,
+                      signal.SIG_DFL if _sigwinch_prev_handler is None else _sigwinch_prev_handler)
+    except ValueError:
+        # Not in main thread, the handler keeps chaining to the previous one
+        pass
 
 
 @export
 class PseudoCanvas:
-    def __init__(self, *, auto_append=False):
+    def __init__(self, *, auto_append=False, fps=30, maxlen=None):
         self.auto_append = auto_append
-        self.lines = []
-        self.dirty = []
-        self.avail_space = 0
+
+        # Only the last maxlen lines are kept if specified
+        import collections
+        self.lines = [] if maxlen is None else collections.deque(maxlen=maxlen)
+        self.dropped = 0
+
+        # Line numbers (including dropped lines) that need to be redrawn
+        self.dirty = set()
+
+        # Viewport is scroll lines above the last line
+        self._scroll = 0
+
+        # Content on screen for each row, the last row shows line number self.end - 1
+        self.frame = None
+        self.end = 0
         self.cursor = 0
 
+        self.term_size = None
+        self.term_size_watched = False
+        self.sigwinch_count = None
+
+        self.frames = 0
+        self.bytes_written = 0
+
+        import threading
+        self.lock = threading.RLock()
+        self.print_lock = threading.Lock()
+        self.fps = fps
+        self.thread = None
+        self.redraw = False
+        self.updated = threading.Event()
+        self.is_end = threading.Event()
+
         import builtins
         self.print = builtins.print
 
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
     def append(self, line=''):
-        self.lines.append(line)
-        self.dirty.append(True)
+        with self.lock:
+            self.dirty.add(self.dropped + len(self.lines))
+            if len(self.lines) == self.lines_maxlen:
+                self.dropped += 1
+            self.lines.append(line)
+
+            # Keep viewport on the same lines
+            if self._scroll:
+                self._scroll += 1
+        self.updated.set()
 
     def extend(self, lines=[]):
-        for line in lines:
-            self.append(line)
+        with self.lock:
+            for line in lines:
+                self.append(line)
+
+    @property
+    def lines_maxlen(self):
+        return getattr(self.lines, 'maxlen', None)
 
     @property
     def empty(self):
@@ -597,48 +1364,217 @@ class PseudoCanvas:
         return self.lines[idx]
 
     def __setitem__(self, idx, line):
-        if self.auto_append:
-            for i in range(len(self), idx + 1):
-                self.append()
+        with self.lock:
+            if self.auto_append:
+                for i in range(len(self), idx + 1):
+                    self.append()
 
-        self.lines[idx] = line
-        self.dirty[idx] = True
+            self.lines[idx] = line
+            self.dirty.add(self.dropped + idx % len(self.lines))
+        self.updated.set()
 
-    def render(self, *, all=None):
-        if self.empty:
+    @property
+    def scroll(self):
+        return self._scroll
+
+    @scroll.setter
+    def scroll(self, value):
+        with self.lock:
+            self._scroll = max(0, min(value, len(self.lines) - 1))
+        self.updated.set()
+
+    def get_terminal_size(self):
+        # Cached until SIGWINCH is received, SIGWINCH is only watched between start() and stop()
+        resized = False
+        if (self.term_size is None or
+                not self.term_size_watched or
+                self.sigwinch_count != _sigwinch_count):
+            import shutil
+            term_size = shutil.get_terminal_size()
+            resized = self.term_size is not None and term_size != self.term_size
+            self.term_size = term_size
+            self.sigwinch_count = _sigwinch_count
+
+        return self.term_size, resized
+
+    def move_cursor(self, buf, row):
+        # Moving down with newlines is shorter, and creates new rows on screen
+        dist = min(row, len(self.frame) - 1) - self.cursor
+        if dist < 0:
+            buf.append('\033[{}A'.format(-dist))
+        elif dist < 4:
+            buf.append('\n' * dist)
+        else:
+            buf.append('\033[{}B'.format(dist))
+
+        if row >= len(self.frame):
+            buf.append('\n' * (row - len(self.frame) + 1))
+            self.frame += [None] * (row - len(self.frame) + 1)
+
+        self.cursor = row
+
+    def diff_line(self, old, new):
+        # Find the first changed cell, only if no escape sequence is involved
+        if old and '\033' not in old and '\033' not in new:
+            idx = 0
+            for a, b in zip(old, new):
+                if a != b:
+                    break
+                idx += 1
+
+            # Don't split a char from its combining marks
+            while idx > 0 and (
+                    (idx < len(new) and charwidth(new[idx]) == 0) or
+                    (idx < len(old) and charwidth(old[idx]) == 0)):
+                idx -= 1
+
+            col = strwidth(new[:idx])
+            if col:
+                return '\r\033[{}C\033[K{}'.format(col, new[idx:])
+
+        return '\r\033[K' + new
+
+    def start(self):
+        if self.thread:
             return
 
-        if all:
-            self.dirty = [True for d in self.dirty]
+        # Signal handler can only be installed in the main thread, not the render thread
+        if not self.term_size_watched:
+            self.term_size_watched = watch_terminal_size()
+
+        import threading
+        self.is_end.clear()
+        self.thread = threading.Thread(target=self.render_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, wait=True):
+        self.is_end.set()
+        self.updated.set()
+        if wait and self.thread:
+            self.thread.join()
+            self.thread = None
+
+        if not self.thread and self.term_size_watched:
+            unwatch_terminal_size()
+            self.term_size_watched = False
+
+    def render_loop(self):
+        # Coalesce updates, and render at most fps times per second
+        while not self.is_end.is_set():
+            if not self.updated.wait(1 / self.fps):
+                # Check for resizing (every time if it cannot be watched)
+                if self.term_size_watched and self.sigwinch_count == _sigwinch_count:
+                    continue
+            self.updated.clear()
+            if self.is_end.is_set():
+                break
+            self.render_frame()
+            self.is_end.wait(1 / self.fps)
+
+        self.render_frame()
+
+    def render(self, *, all=None):
+        import threading
+        if self.thread and threading.current_thread() is not self.thread:
+            # Leave it to render thread
+            if all:
+                self.redraw = True
+            self.updated.set()
+            return 0
+
+        return self.render_frame(all=all)
+
+    def render_frame(self, *, all=None):
+        # Producers only wait for the frame to be composed, not for terminal I/O
+        with self.print_lock:
+            with self.lock:
+                data = self.render_locked(all=all or self.redraw)
+
+            if not data:
+                return 0
 
-        import shutil
-        term_size = shutil.get_terminal_size()
+            self.print(data, end='', flush=True)
+
+            nbytes = len(data.encode('utf8'))
+            self.frames += 1
+            self.bytes_written += nbytes
+            return nbytes
+
+    def render_locked(self, *, all=None):
+        self.redraw = False
+        if self.empty:
+            return ''
+
+        term_size, resized = self.get_terminal_size()
         term_width = term_size.columns
         term_height = term_size.lines
 
-        # Assumed that cursor is always at the end of last line
-        from .lib_itertools import lookahead
-        for (idx, line), is_last in lookahead(enumerate(self.lines)):
-            # Skip non-dirty lines, but always redraw the last line
-            if not self.dirty[idx] and not is_last:
-                continue
-
-            # Skip out-of-screen lines
-            if len(self) > term_height and idx < len(self) - term_height:
+        total = self.dropped + len(self.lines)
+
+        # Canvas never shrinks on screen, to not leave garbage rows
+        nrows = min(max(len(self.lines), len(self.frame or ())), term_height)
+        self._scroll = max(0, min(self._scroll, len(self.lines) - nrows))
+        end = total - self._scroll
+
+        buf = []
+
+        # Assumed that canvas starts from the row of cursor
+        if self.frame is None:
+            self.frame = [None]
+            self.cursor = 0
+            self.end = end - nrows + 1
+
+        if all or resized:
+            self.frame = [None] * min(len(self.frame), term_height)
+            self.cursor = min(self.cursor, len(self.frame) - 1)
+            self.end = end
+
+        dirty, self.dirty = self.dirty, set()
+
+        new_lines = end - self.end
+        fresh = len(self.frame)
+        if (not self._scroll and nrows == term_height and
+                new_lines > 0 and len(self.frame) + new_lines > nrows):
+            # Following the last line, scroll rows up with newlines
+            self.move_cursor(buf, len(self.frame) - 1)
+            buf.append('\n' * (nrows - len(self.frame) + min(len(self.frame) + new_lines - nrows, nrows)))
+            self.frame = (self.frame + [None] * new_lines)[-nrows:]
+            self.cursor = nrows - 1
+            self.end = end
+            fresh = nrows - min(new_lines, nrows)
+
+        top = end - nrows
+        if all or resized or top != self.end - len(self.frame):
+            # Viewport moved, check every row
+            rows = range(nrows)
+        else:
+            # Dirty lines in viewport, and rows that are not drawn yet
+            rows = {idx - top for idx in dirty if top <= idx < end}
+            rows.update(range(fresh, nrows))
+        self.end = end
+
+        written = None
+        for row in sorted(rows):
+            idx = top + row - self.dropped
+            line = clip(self.lines[idx], term_width) if idx >= 0 else ''
+
+            old = self.frame[row] if row < len(self.frame) else None
+            if line == old:
                 continue
 
-            # Align cursor position
-            if self.cursor != idx:
-                dist = min(abs(self.cursor - idx), self.avail_space - 1)
-                if dist > 0:
-                    self.print('\r\033[{}{}'.format(dist, 'A' if self.cursor > idx else 'B'), end='')
+            self.move_cursor(buf, row)
+            buf.append(self.diff_line(old, line))
+            self.frame[row] = line
+            written = row
 
-            # Print content onto screen
-            self.print('\r{}\033[K'.format(wrap(line, term_width)[0]),
-                  end='' if is_last else '\n')
+        if not buf:
+            return ''
 
-            # Estimate cursor position
-            self.cursor = idx + (not is_last)
+        # Park cursor at the end of last line
+        if written != nrows - 1:
+            self.move_cursor(buf, nrows - 1)
+            width = strwidth(self.frame[-1] or '')
+            buf.append('\r\033[{}C'.format(width) if width else '\r')
 
-            self.avail_space = min(term_height, max(self.avail_space, idx + 1))
-            self.dirty[idx] = False
+        return ''.join(buf)
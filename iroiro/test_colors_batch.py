@@ -0,0 +1,60 @@
+from .lib_test_utils import *
+
+import array
+
+from iroiro import Color256, ColorRGB, ColorHSV
+from iroiro import rgb_to_hsv, hsv_to_rgb, color256_to_rgb
+
+
+rgb_samples = [(r, g, b)
+               for r in range(0, 256, 17)
+               for g in range(0, 256, 51)
+               for b in (0, 1, 127, 128, 254, 255)]
+
+hsv_samples = [(h, s, v)
+               for h in (-30, 0, 0.5, 41, 119.5, 180, 300.2, 359.6, 360, 720)
+               for s in (0, 0.5, 50, 100)
+               for v in (0, 33.3, 100)]
+
+
+class TestColorBatch(TestCase):
+    def test_rgb_to_hsv(self):
+        self.eq(rgb_to_hsv(rgb_samples),
+                [ColorRGB(*rgb).to_hsv().hsv for rgb in rgb_samples])
+
+    def test_rgb_to_hsv_regulated(self):
+        samples = [(255.4, -3, 12.5), (300, 0.4, 0.6)]
+        self.eq(rgb_to_hsv(samples),
+                [ColorRGB(*rgb, overflow=True).to_hsv().hsv for rgb in samples])
+
+    def test_hsv_to_rgb(self):
+        self.eq(hsv_to_rgb(hsv_samples),
+                [ColorHSV(*hsv).to_rgb().rgb for hsv in hsv_samples])
+
+    def test_color256_to_rgb(self):
+        self.eq(color256_to_rgb(range(256)),
+                [Color256(i).to_rgb().rgb for i in range(256)])
+
+    def test_buffer(self):
+        buf = array.array('B', [192, 255, 238, 255, 175, 0])
+        self.eq(rgb_to_hsv(buf), rgb_to_hsv([(192, 255, 238), (255, 175, 0)]))
+        self.eq(rgb_to_hsv(bytes(buf)), rgb_to_hsv(buf))
+
+    def test_generator(self):
+        self.eq(hsv_to_rgb(hsv for hsv in hsv_samples), hsv_to_rgb(hsv_samples))
+        self.eq(rgb_to_hsv([]), [])
+
+    def test_numpy(self):
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest('numpy is not installed')
+
+        self.eq(rgb_to_hsv(np.array(rgb_samples)).tolist(),
+                [list(hsv) for hsv in rgb_to_hsv(rgb_samples)])
+
+        self.eq(hsv_to_rgb(np.array(hsv_samples)).tolist(),
+                [list(rgb) for rgb in hsv_to_rgb(hsv_samples)])
+
+        self.eq(color256_to_rgb(np.arange(256)).tolist(),
+                [list(rgb) for rgb in color256_to_rgb(range(256))])
@@ -2,7 +2,8 @@ from .lib_test_utils import *
 
 from iroiro import ColorCompound
 from iroiro import color, paint
-from iroiro import nocolor, orange, bold
+from iroiro import nocolor, orange, bold, underline
+from iroiro import Emphasis, Color8, ColorRGB, ColorHSV
 
 
 orange = color(214)
@@ -73,3 +74,52 @@ class TestColorTraits(TestCase):
     def test_or_with_emphasis(self):
         ob = orange | bold
         self.eq(ob('wah'), '\033[1;38;5;214mwah\033[m')
+
+    def test_immutable(self):
+        with self.raises(AttributeError):
+            orange.index = 208
+
+        with self.raises(AttributeError):
+            coffee.r = 0
+
+        with self.raises(AttributeError):
+            purple.h = 0
+
+        with self.raises(AttributeError):
+            del orange.index
+
+        with self.raises(AttributeError):
+            (orange | bold).fg = coffee
+
+        with self.raises(AttributeError):
+            orange.wah = 1
+
+    def test_emphasis_options_ignored(self):
+        self.eq(color(214, bold=True), orange)
+        self.eq(Color8(1, underline=True), Color8(1))
+        with self.raises(AttributeError):
+            color(214, bold=True).bold
+
+    def test_pickle(self):
+        import pickle
+        for c in (nocolor, bold | underline, Emphasis(),
+                  orange, color(3), color(), coffee, ColorRGB(-10, 300, 0.5, overflow=True),
+                  purple, ColorHSV(400, 200, 50, overflow=True), ColorHSV(),
+                  orange | bold, paint(fg=coffee, bg=purple, reset=True)):
+            c2 = pickle.loads(pickle.dumps(c))
+            self.eq(type(c2), type(c))
+            self.eq(repr(c2), repr(c))
+            self.eq(c2, c)
+
+    def test_hash(self):
+        self.eq(len({orange, color(214), coffee, color('#C0FFEE'), purple}), 3)
+        self.eq({orange: 'orange'}[color(214)], 'orange')
+        self.eq(hash(orange), hash(str(orange)))
+        self.eq(hash(nocolor), hash(paint(reset=True)))
+
+    def test_intern(self):
+        self.true(color(214) is color(214))
+        self.true(color('#C0FFEE') is color('#C0FFEE'))
+        self.true(color(192, 255, 238) is color(192, 255, 238))
+        self.true(color('@300,100,50') is color('@300,100,50'))
+        self.true(color(orange) is orange)
@@ -1,6 +1,8 @@
 from .lib_test_utils import *
 
-from iroiro import decolor
+import io
+
+from iroiro import decolor, decolor_stream
 from iroiro import orange
 
 
@@ -8,3 +10,41 @@ class TestDecolor(TestCase):
     def test_decolor(self):
         self.eq(decolor(orange('test')), 'test')
         self.eq(decolor('\033[1;31mred\033[m'), 'red')
+
+    def test_decolor_bytes(self):
+        self.eq(decolor(b'\033[1;31mred\033[m'), b'red')
+
+    def test_decolor_escapes(self):
+        s = '\033]0;title\007\033[2K\033[1;31mred\033[m\033]8;;url\033\\link'
+        self.eq(decolor(s), '\033]0;title\007\033[2Kred\033]8;;url\033\\link')
+        self.eq(decolor(s, escapes=True), 'redlink')
+
+
+class TestDecolorStream(TestCase):
+    text = ('a' + orange('bc') + '\033]8;;http://example.com\033\\d\033]8;;\007' +
+            '\033[1;31me\033[2Kf\033[m\033')
+
+    def test_chunks(self):
+        for escapes in (False, True):
+            expected = decolor(self.text, escapes=escapes)
+            for n in range(1, len(self.text) + 1):
+                chunks = [self.text[i:i+n] for i in range(0, len(self.text), n)]
+                self.eq(''.join(decolor_stream(chunks, escapes=escapes)), expected)
+
+    def test_bytes(self):
+        data = self.text.encode()
+        for n in (1, 2, 3, 5, 8):
+            chunks = [data[i:i+n] for i in range(0, len(data), n)]
+            self.eq(b''.join(decolor_stream(chunks, escapes=True)),
+                    decolor(data, escapes=True))
+
+    def test_file(self):
+        f = io.BytesIO(self.text.encode())
+        self.eq(b''.join(decolor_stream(f, chunksize=3)), decolor(self.text).encode())
+
+        f = io.StringIO(self.text)
+        self.eq(''.join(decolor_stream(f, chunksize=3)), decolor(self.text))
+
+    def test_str(self):
+        self.eq(list(decolor_stream(orange('abc'))), ['abc'])
+        self.eq(list(decolor_stream('')), [])
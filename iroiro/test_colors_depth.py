@@ -0,0 +1,118 @@
+from .lib_test_utils import *
+
+import os
+import unittest.mock
+
+from iroiro import Color8, Color256, ColorRGB
+from iroiro import color, paint, nocolor, bold
+from iroiro import get_color_depth, set_color_depth, color_depth, detect_color_depth
+
+
+coffee = color('#C0FFEE')
+orange = color(214)
+
+
+class FakeFile:
+    def __init__(self, tty):
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+
+class TestColorDepth(TestCase):
+    def test_default(self):
+        self.eq(get_color_depth(), 'truecolor')
+        self.eq(coffee('text'), '\033[38;2;192;255;238mtext\033[m')
+
+    def test_256(self):
+        with color_depth(256):
+            self.eq(get_color_depth(), 256)
+            self.eq(coffee('text'), '\033[38;5;159mtext\033[m')
+            self.eq(coffee.bg('text'), '\033[48;5;159mtext\033[m')
+            self.eq(str(coffee), '\033[38;5;159m')
+            self.eq(orange('text'), '\033[38;5;214mtext\033[m')
+            self.eq(Color8(1)('text'), '\033[31mtext\033[m')
+        self.eq(get_color_depth(), 'truecolor')
+
+    def test_16(self):
+        with color_depth('16'):
+            self.eq(coffee('text'), '\033[97mtext\033[m')
+            self.eq(coffee.bg('text'), '\033[107mtext\033[m')
+            self.eq(Color256(1)('text'), '\033[31mtext\033[m')
+            self.eq(Color256(9).bg('text'), '\033[101mtext\033[m')
+            self.eq((orange / coffee | bold)('text'), '\033[1;93;107mtext\033[m')
+
+    def test_8(self):
+        with color_depth(8):
+            self.eq(coffee('text'), '\033[37mtext\033[m')
+            self.eq(Color256(9)('text'), '\033[31mtext\033[m')
+
+    def test_none(self):
+        with color_depth(None):
+            self.eq(coffee('text'), 'text')
+            self.eq(str(coffee), '')
+            self.eq(str(nocolor), '')
+            self.eq(bold('text'), 'text')
+            self.eq(paint(reset=True)('text'), 'text')
+            self.eq('{}text{}'.format(orange, nocolor), 'text')
+
+    def test_eq_hash_unchanged(self):
+        with color_depth('none'):
+            self.eq(coffee.seq, '\033[38;2;192;255;238m')
+            self.eq(hash(coffee), hash('\033[38;2;192;255;238m'))
+            self.eq(coffee, ColorRGB(192, 255, 238))
+
+    def test_set_color_depth(self):
+        self.addCleanup(set_color_depth, 'truecolor')
+        set_color_depth(256)
+        self.eq(get_color_depth(), 256)
+        self.eq(coffee('text'), '\033[38;5;159mtext\033[m')
+
+        with color_depth(16):
+            self.eq(get_color_depth(), 16)
+        self.eq(get_color_depth(), 256)
+
+        with self.raises(ValueError):
+            set_color_depth(42)
+
+        with self.raises(ValueError):
+            color_depth([])
+
+    def test_detect(self):
+        def detect(env, tty=True):
+            detect_color_depth.cache_clear()
+            with unittest.mock.patch.dict(os.environ, env, clear=True):
+                return detect_color_depth(FakeFile(tty))
+
+        self.addCleanup(detect_color_depth.cache_clear)
+
+        self.eq(detect({'TERM': 'xterm-256color', 'COLORTERM': 'truecolor'}), 'truecolor')
+        self.eq(detect({'TERM': 'xterm-256color', 'COLORTERM': '24bit'}), 'truecolor')
+        self.eq(detect({'TERM': 'xterm-direct'}), 'truecolor')
+        self.eq(detect({'TERM': 'xterm-256color'}), 256)
+        self.eq(detect({'TERM': 'xterm'}), 16)
+        self.eq(detect({'TERM': 'dumb'}), None)
+        self.eq(detect({}), None)
+        self.eq(detect({'TERM': 'xterm-256color'}, tty=False), None)
+        self.eq(detect({'TERM': 'xterm-256color', 'NO_COLOR': '1'}), None)
+
+        with unittest.mock.patch.dict(os.environ, {'TERM': 'xterm-256color'}, clear=True):
+            detect_color_depth.cache_clear()
+            f = FakeFile(True)
+            self.eq(detect_color_depth(f), 256)
+            f.tty = False
+            self.eq(detect_color_depth(f), None)
+
+        # Cached on the file descriptor, not on the file object
+        with unittest.mock.patch.dict(os.environ, {'TERM': 'xterm-256color'}, clear=True):
+            detect_color_depth.cache_clear()
+            with open(os.devnull) as f:
+                self.eq(detect_color_depth(f), None)
+            self.eq(detect_color_depth(FakeFile(True)), 256)
+            with unittest.mock.patch.dict(os.environ, {'TERM': 'xterm'}):
+                self.eq(detect_color_depth(FakeFile(True)), 256)
+
+    def test_auto(self):
+        with color_depth('auto'):
+            self.eq(get_color_depth(), detect_color_depth())
@@ -84,3 +84,9 @@ class TestEmphasis(TestCase):
 
         bu = bold | underline
         self.eq(repr(bu), 'Emphasis(bold=True, underline=True)')
+
+    def test_immutable(self):
+        with self.raises(AttributeError):
+            bold.underline = True
+
+        self.eq(len({bold, Emphasis(1), underline}), 2)
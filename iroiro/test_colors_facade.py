@@ -148,3 +148,21 @@ class TestColorFacade(TestCase):
 
         # Unknown leading code
         self.eq(color('\033[39m'), color())
+
+    def test_color_parse_bright(self):
+        # Bright colors were ignored before, they are Color256(8 ~ 15) now
+        self.eq(color('\033[90m'), paint(fg=Color256(8)))
+        self.eq(color('\033[97m'), paint(fg=Color256(15)))
+        self.eq(color('\033[100m'), paint(bg=Color256(8)))
+        self.eq(color('\033[91;107m'), paint(fg=Color256(9), bg=Color256(15)))
+
+    def test_color_parse_memoized(self):
+        seq = '\033[1;38;5;208morange \033[48;5;208morange\033[m '
+        self.true(color(seq) is color(seq))
+
+    def test_color_parse_invalid_value(self):
+        with self.raises(ValueError):
+            color('\033[38;5;300m')
+
+        with self.raises(TypeError):
+            color('\033[38;2;300;0;0m')
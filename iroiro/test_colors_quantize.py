@@ -0,0 +1,83 @@
+from .lib_test_utils import *
+
+from iroiro import Color8, Color256, ColorRGB, ColorHSV
+from iroiro import color, rgb_to_color256, color256_to_rgb
+
+
+palette = color256_to_rgb(range(256))
+
+
+def brute_force(rgb, size):
+    def dist(idx):
+        return sum((a - b) ** 2 for a, b in zip(rgb, palette[idx]))
+    return min(range(size), key=lambda idx: (dist(idx), idx))
+
+
+samples = ([(r, g, b)
+            for r in (0, 47, 48, 95, 114, 115, 116, 200, 254, 255)
+            for g in (0, 8, 13, 18, 128, 235, 238, 255)
+            for b in (0, 3, 94, 155, 156, 243, 255)] +
+           [(v, v, v) for v in range(256)])
+
+
+class TestColorQuantize(TestCase):
+    def test_to_256(self):
+        for rgb in samples:
+            self.eq(ColorRGB(*rgb).to_256(), Color256(brute_force(rgb, 256)), rgb)
+
+    def test_to_256_palette_16(self):
+        for rgb in samples:
+            self.eq(ColorRGB(*rgb).to_256(palette=16), Color256(brute_force(rgb, 16)), rgb)
+
+    def test_to_8(self):
+        for rgb in samples:
+            self.eq(ColorRGB(*rgb).to_8(), Color8(brute_force(rgb, 8)), rgb)
+
+    def test_exact(self):
+        for i in range(16, 256):
+            self.eq(Color256(i).to_rgb().to_256().to_rgb(), Color256(i).to_rgb())
+        for i in range(16):
+            self.eq(Color256(i).to_256(palette=16), Color256(i))
+        self.eq(Color256(214).to_256(palette=16), Color256(11))
+        self.eq(Color256(214).to_256(palette=8), Color256(3))
+        for i in range(8):
+            self.eq(Color8(i).to_8(), Color8(i))
+            self.eq(Color8(i).to_256(), Color256(i))
+
+        self.true(color(214).to_256() is color(214))
+
+    def test_hsv(self):
+        self.eq(ColorHSV(41, 100, 100).to_256(), Color256(214))
+        self.eq(ColorHSV(0, 100, 100).to_8(), Color8(1))
+
+    def test_metric(self):
+        for metric in ('rgb', 'weighted', 'cie76'):
+            self.eq(ColorRGB(255, 0, 0).to_256(metric=metric), Color256(9))
+            self.eq(ColorRGB(0, 0, 0).to_256(metric=metric, palette=16), Color256(0))
+            self.eq(ColorRGB(250, 250, 250).to_8(metric=metric), Color8(7))
+
+        self.ne(ColorRGB(32, 96, 48).to_256(metric='rgb'),
+                ColorRGB(32, 96, 48).to_256(metric='cie76'))
+
+        with self.raises(ValueError):
+            ColorRGB(1, 2, 3).to_256(metric='wah')
+
+    def test_batch(self):
+        self.eq(rgb_to_color256(samples), [int(ColorRGB(*rgb).to_256()) for rgb in samples])
+        self.eq(rgb_to_color256(samples, palette=16), [int(ColorRGB(*rgb).to_256(palette=16)) for rgb in samples])
+        self.eq(rgb_to_color256(samples, palette=8, metric='cie76'),
+                [int(ColorRGB(*rgb).to_8(metric='cie76')) for rgb in samples])
+
+        with self.raises(ValueError):
+            rgb_to_color256(samples, palette=88)
+
+    def test_numpy(self):
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest('numpy is not installed')
+
+        for metric in ('rgb', 'weighted', 'cie76'):
+            for palette in (256, 16, 8):
+                self.eq(rgb_to_color256(np.array(samples), palette, metric).tolist(),
+                        rgb_to_color256(samples, palette, metric))
@@ -0,0 +1,77 @@
+from .lib_test_utils import *
+
+import io
+
+from iroiro import Color8
+from iroiro import color, paint, segments
+from iroiro import bold, underline, red
+
+
+orange = color(214)
+text = ('a' + orange('bc') + 'd' + (bold | red)('ef') +
+        '\033[4mg\033[Kh\033[0;1mi\033[mj')
+
+expected = [
+        (paint(), 'a'),
+        (paint(fg=orange), 'bc'),
+        (paint(), 'd'),
+        (paint(em=bold, fg=red), 'ef'),
+        (paint(em=underline), 'g\033[Kh'),
+        (paint(em=bold), 'i'),
+        (paint(), 'j'),
+        ]
+
+
+def merge(runs):
+    ret = []
+    for style, s in runs:
+        if ret and ret[-1][0] == style:
+            ret[-1] = (style, ret[-1][1] + s)
+        else:
+            ret.append((style, s))
+    return ret
+
+
+class TestSegments(TestCase):
+    def test_str(self):
+        self.eq(list(segments(text)), expected)
+        self.eq(list(segments('')), [])
+        self.eq(list(segments('\033[1m\033[m')), [])
+
+    def test_accumulate(self):
+        self.eq(list(segments('\033[1m\033[4ma\033[31mb')), [
+            (paint(em=bold | underline), 'a'),
+            (paint(em=bold | underline, fg=Color8(1)), 'b'),
+            ])
+
+    def test_file(self):
+        for chunksize in range(1, 12):
+            self.eq(merge(segments(io.StringIO(text), chunksize=chunksize)), expected)
+
+    def test_binary(self):
+        data = text.encode('utf8')
+        for chunksize in range(1, 12):
+            self.eq(merge(segments(io.BytesIO(data), chunksize=chunksize)), expected)
+        self.eq(merge(segments(data)), expected)
+
+        data = '測試'.encode('utf8')
+        self.eq(merge(segments([data[:2], data[2:3] + b'\033[1m' + data[3:]])), [
+            (paint(), '測'),
+            (paint(em=bold), '試'),
+            ])
+        self.eq(list(segments(data[:2])), [(paint(), '\\xe6\\xb8')])
+        self.eq(list(segments('測試'.encode('big5'), encoding='big5')), [(paint(), '測試')])
+
+    def test_iterable(self):
+        chunks = [text[i:i+3] for i in range(0, len(text), 3)]
+        self.eq(merge(segments(iter(chunks))), expected)
+
+    def test_incomplete_seq(self):
+        self.eq(list(segments(['a\033[3', '1'])), [(paint(), 'a'), (paint(), '\033[31')])
+        self.eq(merge(segments(['a\033[3', 'Xb'])), [(paint(), 'a\033[3Xb')])
+        self.eq(merge(segments(['a\033', '[31mb'])), [(paint(), 'a'), (paint(fg=Color8(1)), 'b')])
+
+    def test_reset_style(self):
+        style, s = list(segments('\033[1m\033[0;31mx'))[0]
+        self.false(style.reset)
+        self.eq(style, paint(fg=Color8(1)))
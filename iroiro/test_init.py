@@ -0,0 +1,74 @@
+import os
+import sys
+import importlib
+import subprocess
+
+from .lib_test_utils import *
+
+import iroiro
+from . import internal_exports
+
+
+class TestLazyLoading(TestCase):
+    def run_python(self, code):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        p = subprocess.run([sys.executable, '-c', code], cwd=root,
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.eq(p.stderr, b'')
+        return p.stdout.decode().split()
+
+    def test_exports_index(self):
+        def module_names(prefix):
+            return sorted(f[len(prefix):-3] for f in os.listdir(os.path.dirname(iroiro.__file__))
+                          if f.startswith(prefix) and f.endswith('.py'))
+
+        self.eq(internal_exports.lib_modules, tuple(module_names('lib_')))
+        self.eq(internal_exports.bin_modules, tuple(module_names('bin_')))
+
+        exports = {}
+        for name in internal_exports.lib_modules:
+            module = importlib.import_module('iroiro.lib_' + name)
+            exports.update({attr: name for attr in module.__all__})
+        self.eq(internal_exports.exports, exports)
+
+    def test_namespace(self):
+        self.eq(iroiro.tui, sys.modules['iroiro.lib_tui'])
+        self.eq(iroiro.strwidth, iroiro.tui.strwidth)
+        self.eq(iroiro.paint, iroiro.colors.paint)
+        self.eq(iroiro.bin.rainbow, sys.modules['iroiro.bin_rainbow'])
+        self.true('strwidth' in dir(iroiro))
+        self.true('sponge' in dir(iroiro.bin))
+        self.false(hasattr(iroiro, 'lib_tui'))
+
+        with self.raises(AttributeError):
+            iroiro.no_such_thing
+
+        with self.raises(AttributeError):
+            iroiro.bin.no_such_thing
+
+    def test_namespace_cleanup(self):
+        self.eq(self.run_python(
+            'import iroiro\n'
+            'print(sorted(n for n in vars(iroiro) if n.startswith(("lib_", "bin_"))))\n'
+            'iroiro.bin.rainbow\n'
+            'print(sorted(n for n in vars(iroiro) if n.startswith(("lib_", "bin_"))))\n'
+            'iroiro.paint\n'
+            'print(sorted(n for n in vars(iroiro) if n.startswith(("lib_", "bin_"))))\n'
+            ), ['[]', '[]', '[]'])
+
+    def test_lazy(self):
+        self.eq(self.run_python(
+            'import sys, iroiro\n'
+            'print(sorted(m for m in sys.modules if m.startswith("iroiro.lib_")))\n'
+            'iroiro.red\n'
+            'print(sorted(m for m in sys.modules if m.startswith("iroiro.lib_")))\n'
+            'print("subprocess" in sys.modules, "iroiro.lib_subproc" in sys.modules)\n'
+            ), ['[]',
+                "['iroiro.lib_colors',", "'iroiro.lib_itertools',", "'iroiro.lib_math']",
+                'False', 'False'])
+
+    def test_import_star(self):
+        self.eq(self.run_python(
+            'from iroiro import *\n'
+            'print(paint, run, getch, bin.rainbow.__name__)\n'
+            )[-1], 'iroiro.bin_rainbow')
@@ -8,6 +8,7 @@ from iroiro import *
 
 import iroiro
 stream = iroiro.subproc.stream
+DEFAULT_CHUNKSIZE = iroiro.subproc.DEFAULT_CHUNKSIZE
 
 
 def queue_to_list(Q):
@@ -132,6 +133,143 @@ class TestStream(TestCase):
         self.eq(data1, lines)
         self.eq(data2, lines)
 
+    def test_stream_write_batch(self):
+        data = []
+        s = stream()
+        s.welcome((data.append, True))
+        s.write_batch(['line1', 'line2'])
+        s.write_batch([])
+        s.writeline('line3')
+        self.eq(data, ['line1', 'line2', 'line3'])
+        self.eq(s.lines, ['line1', 'line2', 'line3'])
+        self.eq(s.readline(), 'line1')
+        self.false(s.empty)
+        s.close()
+        self.eq(list(s.batches()), [['line1', 'line2', 'line3']])
+
+        data.clear()
+        s = stream()
+        s.batch = 2
+        s.welcome(data.append)
+        s.write_batch(['line1', 'line2', 'line3'])
+        s.writeline('line4')
+        self.eq(data, [['line1', 'line2'], ['line3'], 'line4'])
+        self.eq(s.readline(), 'line1')
+        s.close()
+        self.eq(list(s.batches()), [])
+
+        s = stream()
+        s.write_batch(['line1', 'line2', 'line3'])
+        s.writeline('line4')
+        self.eq(s.readline(), 'line1')
+        batches = s.batches()
+        self.eq(next(batches), ['line2', 'line3'])
+        s.close()
+        self.eq(list(batches), [['line4']])
+
+        with self.raises(BrokenPipeError):
+            s.write_batch(['line5'], suppress=False)
+
+    def test_stream_capacity(self):
+        s = stream(maxlines=3)
+        s.writelines(['line1', 'line2', 'line3'])
+        self.true(s.full)
+
+        t = threading.Thread(target=s.writeline, args=('line4',))
+        t.daemon = True
+        t.start()
+        t.join(0.05)
+        self.true(t.is_alive())
+
+        self.eq(s.readline(), 'line1')
+        t.join(1)
+        self.false(t.is_alive())
+        self.eq([s.readline() for i in range(3)], ['line2', 'line3', 'line4'])
+        self.false(s.full)
+
+        s.writelines(['line5', 'line6', 'line7'])
+        with self.raises(queue.Full):
+            s.writeline('line8', block=False)
+        with self.raises(queue.Full):
+            s.writeline('line8', timeout=0.01)
+        self.eq(s.queue.lines, 3)
+        s.writeline('line8', force=True)
+        self.eq(s.queue.lines, 4)
+
+        t = threading.Thread(target=s.writeline, args=('line9',))
+        t.daemon = True
+        t.start()
+        s.close()
+        t.join(1)
+        self.false(t.is_alive())
+        self.eq(list(iter(s.readline, None)), ['line5', 'line6', 'line7', 'line8'])
+
+        s = stream(maxlines=3)
+        s.writelines(['line1', 'line2', 'line3'])
+        t = threading.Thread(target=s.writeline, args=('line4',))
+        t.daemon = True
+        t.start()
+        s.release()
+        t.join(1)
+        self.false(t.is_alive())
+        self.false(s.full)
+        s.writeline('line5', force=True)
+        self.eq(s.dropped_lines, 2)
+        s.close()
+        self.eq(list(iter(s.readline, None)), ['line1', 'line2', 'line3'])
+
+        s = stream(maxbytes=10)
+        s.write(b'0123456789abcdef')
+        self.true(s.full)
+        self.eq(s.queue.size, 16)
+
+        with self.raises(ValueError):
+            stream(maxlines=3, overflow='drop')
+
+    def test_stream_overflow(self):
+        s = stream(maxlines=3, overflow='drop-newest')
+        s.writelines(['line1', 'line2', 'line3', 'line4', 'line5'])
+        self.false(s.full)
+        self.eq(s.dropped_lines, 2)
+        self.eq(s.dropped_bytes, 10)
+        s.close()
+        self.eq(list(iter(s.readline, None)), ['line1', 'line2', 'line3'])
+
+        s = stream(maxlines=3, overflow='drop-oldest')
+        s.writelines(['line1', 'line2', 'line3', 'line4', 'line5'])
+        self.eq(s.dropped_lines, 2)
+        s.close()
+        self.eq(list(iter(s.readline, None)), ['line3', 'line4', 'line5'])
+
+        s = stream(maxbytes=8, overflow='drop-oldest')
+        s.batch = True
+        s.write_batch(['aa', 'bb'])
+        s.write_batch(['cc', 'dd'])
+        s.write_batch(['eeeeeeeeee'])
+        self.eq(s.dropped_lines, 4)
+        self.eq(s.dropped_bytes, 8)
+        s.close()
+        self.eq(list(iter(s.readline, None)), ['eeeeeeeeee'])
+
+    def test_stream_keep_capacity(self):
+        s = stream(maxlines=3, overflow='drop-oldest')
+        s.keep = True
+        s.writelines(['line1', 'line2', 'line3', 'line4'])
+        self.eq(list(s.lines), ['line2', 'line3', 'line4'])
+        self.eq(len(s), 3)
+
+        s = stream(maxlines=3, overflow='drop-newest')
+        s.keep = True
+        s.writelines(['line1', 'line2', 'line3', 'line4'])
+        self.eq(list(s.lines), ['line1', 'line2', 'line3'])
+
+        s = stream(maxbytes=10, overflow='drop-oldest')
+        s.keep = True
+        s.writelines(['line1', 'line2', 'line3'])
+        self.eq(list(s.lines), ['line2', 'line3'])
+        s.writeline('0123456789abcdef')
+        self.eq(list(s.lines), ['0123456789abcdef'])
+
     def test_stream_write_after_close(self):
         def should_not_be_called_handler(line):
             self.fail()
@@ -578,16 +716,455 @@ class TestSubproc(TestCase):
 
     def test_large_amount_of_retention_data(self):
         p = command(['echo', 'a lot of data'], encoding=False)
-        def mock_poll():
-            # block p.poll() until the p.proc writes all stdout and exits
-            while p.proc.poll() is None:
-                pass
-            return p.proc.poll()
-
-        p.poll = mock_poll
         p.run()
         self.eq(p.stdout.lines, [b'a lot of data\n'])
 
+    def test_encoding_false_chunks(self):
+        p = command(['head', '-c', '100000', '/dev/zero'], encoding=False, bufsize=4096)
+        p.poll = None # Reader should not poll
+        p.run()
+        self.true(all(len(chunk) <= 4096 for chunk in p.stdout.lines))
+        self.eq(b''.join(p.stdout.lines), bytes(100000))
+
+        p = run(['printf', 'abcdefg'], encoding=False, bufsize=0)
+        self.eq(b''.join(p.stdout.lines), b'abcdefg')
+
+    def test_encoding_false_zerocopy(self):
+        chunks = []
+        Q = queue.Queue()
+        def callback(view):
+            self.true(isinstance(view, memoryview))
+            chunks.append(bytes(view))
+
+        p = run(['head', '-c', '100000', '/dev/urandom'], stdout=(callback, Q, True),
+                encoding=False, bufsize=4096, zerocopy=True)
+        data = b''.join(chunks)
+        self.eq(len(data), 100000)
+        self.eq(b''.join(queue_to_list(Q)), data)
+        self.eq(p.stdout.lines, [])
+
+        for engine in ('selector', IOEngine(chunksize=16)):
+            chunks.clear()
+            p = run(['printf', 'abcdefg'], stdout=callback, encoding=False, zerocopy=True, engine=engine)
+            self.eq(b''.join(chunks), b'abcdefg')
+
+
+class TestBatch(TestCase):
+    def test_batch(self):
+        for engine in (None, 'selector'):
+            batches = []
+            Q = queue.Queue()
+            p = run(['seq', 100000], stdout=(batches.append, Q, True), batch=True, engine=engine)
+            lines = [str(i) for i in range(1, 100001)]
+            self.true(len(batches) < 1000)
+            self.true(all(isinstance(batch, list) for batch in batches))
+            self.eq(sum(batches, []), lines)
+            self.eq(sum(queue_to_list(Q), []), lines)
+            self.eq(p.stdout.lines, lines)
+            self.eq(list(p.stdout), lines)
+
+    def test_batch_size(self):
+        batches = []
+        p = run(['seq', 1000], stdout=(batches.append, True), batch=7)
+        self.true(all(1 <= len(batch) <= 7 for batch in batches))
+        self.eq(sum(batches, []), [str(i) for i in range(1, 1001)])
+
+    def test_batch_iter(self):
+        p = command(['printf', 'a\\r\\nb\\nc'], batch=True)
+        p.run(wait=False)
+        self.eq([line for line in p.stdout], ['a', 'b', 'c'])
+        p.wait()
+
+    def test_batch_async(self):
+        import asyncio
+        async def main():
+            batches = []
+            async with command(['seq', 1000], stdout=batches.append, batch=True) as p:
+                self.eq([line async for line in p.stdout], [str(i) for i in range(1, 1001)])
+            self.eq(sum(batches, []), [str(i) for i in range(1, 1001)])
+
+        asyncio.run(main())
+
+    def test_batch_pipe(self):
+        p1 = command(['seq', 1000], batch=True)
+        p2 = command('nl -w 1 -s :'.split(), stdin=True, engine='selector')
+        data = []
+        p3 = command(lambda proc: [proc.stdout.writeline(line) for line in proc.stdin],
+                     stdin=True, stdout=data.append)
+        pp = pipe(p1.stdout, p2.stdin, p3.stdin)
+
+        p1.run(wait=False)
+        p2.run(wait=False)
+        p3.run(wait=False)
+        pp.join()
+        p2.wait()
+        p3.wait()
+
+        self.eq(p2.stdout.lines, ['{}:{}'.format(i, i) for i in range(1, 1001)])
+        self.eq(data, [str(i) for i in range(1, 1001)])
+
+    def test_bench_seq(self):
+        import time
+        if not os.environ.get('IROIRO_BENCH'):
+            self.skipTest('set IROIRO_BENCH=1 to run benchmarks')
+
+        n = 10000000
+        for batch in (False, True):
+            t = time.perf_counter()
+            p = run(['seq', n], stdout=lambda line: None, batch=batch)
+            t = time.perf_counter() - t
+            print()
+            print('seq {}, batch={}: {:.2f} s, {:.0f} lines/s'.format(n, batch, t, n / t))
+
+
+class TestCapacity(TestCase):
+    def test_backpressure(self):
+        import time
+        lines = [str(i) for i in range(1, 100001)]
+        for engine in (None, 'selector'):
+            p = command(['seq', 100000], maxlines=10, engine=engine)
+            p.run(wait=False)
+            time.sleep(0.1)
+
+            # The child is blocked on the pipe
+            self.true(p.alive)
+            self.true(p.stdout.queue.lines <= 10 + DEFAULT_CHUNKSIZE)
+            self.eq(list(p.stdout), lines)
+            p.wait()
+            self.eq(p.stdout.dropped_lines, 0)
+
+    def test_backpressure_close(self):
+        for engine in (None, 'selector'):
+            p = command(['seq', 100000], maxlines=10, engine=engine)
+            p.run(wait=False)
+            self.eq(p.stdout.readline(), '1')
+            p.stdout.close()
+            p.wait()
+            self.eq(p.returncode, 0)
+
+    def test_backpressure_kill(self):
+        import time
+        import signal
+        for engine in (None, 'selector'):
+            p = command(['seq', 100000], maxlines=10, engine=engine)
+            p.run(wait=False)
+            time.sleep(0.1)
+            self.true(p.alive)
+
+            t = threading.Thread(target=p.kill)
+            t.daemon = True
+            t.start()
+            t.join(5)
+            self.false(t.is_alive())
+            self.eq(p.returncode, -signal.SIGTERM)
+            self.true(p.stdout.closed)
+            self.true(p.stdout.dropped_lines > 0)
+
+    def test_backpressure_kill_async(self):
+        import asyncio
+        import signal
+        async def main():
+            p = await arun(['seq', 100000], maxlines=10, wait=False)
+            await asyncio.sleep(0.1)
+            p.kill()
+            await asyncio.wait_for(p, 5)
+            self.eq(p.returncode, -signal.SIGTERM)
+
+        asyncio.run(main())
+
+    def test_backpressure_async(self):
+        import asyncio
+        async def main():
+            p = await arun(['seq', 100000], maxlines=10, wait=False)
+            await asyncio.sleep(0.1)
+            self.true(p.alive)
+            self.true(p.stdout.queue.lines <= 10 + DEFAULT_CHUNKSIZE)
+            self.eq([line async for line in p.stdout], [str(i) for i in range(1, 100001)])
+            await p
+
+        asyncio.run(main())
+
+    def test_overflow(self):
+        for engine in (None, 'selector'):
+            p = run(['seq', 1000], maxlines=10, overflow='drop-oldest', engine=engine)
+            self.eq(list(p.stdout.lines), [str(i) for i in range(991, 1001)])
+            self.eq(p.stdout.dropped_lines, 990)
+
+            p = run(['seq', 1000], maxlines=10, overflow='drop-newest', engine=engine)
+            self.eq(list(p.stdout.lines), [str(i) for i in range(1, 11)])
+            self.eq(p.stdout.dropped_lines, 990)
+
+    def test_run_unconsumed(self):
+        import asyncio
+        for engine in (None, 'selector'):
+            p = run(['seq', 100], maxlines=10, engine=engine)
+            self.eq(list(p.stdout.lines), [str(i) for i in range(91, 101)])
+            self.eq(p.returncode, 0)
+
+        async def main():
+            return await arun(['seq', 100], maxlines=10)
+
+        p = asyncio.run(main())
+        self.eq(list(p.stdout.lines), [str(i) for i in range(91, 101)])
+
+
+class TestIOEngine(TestCase):
+    def test_stdout(self):
+        p = run('seq 5'.split(), engine='selector')
+        self.eq(p.stdout.lines, '1 2 3 4 5'.split())
+        self.eq(p.returncode, 0)
+
+        lines = []
+        Q = queue.Queue()
+        p = run('seq 3'.split(), stdout=(lines.append, Q), engine='selector')
+        self.eq(lines, ['1', '2', '3'])
+        self.eq(queue_to_list(Q), ['1', '2', '3'])
+
+    def test_newlines(self):
+        p = run(['printf', 'a \\r\\nb\\rc\\n\\nd'], engine='selector')
+        self.eq(p.stdout.lines, ['a ', 'b', 'c', '', 'd'])
+
+        p = run(['printf', 'a \\nb'], rstrip=None, engine='selector')
+        self.eq(p.stdout.lines, ['a', 'b'])
+
+    def test_stderr(self):
+        p = run(['sh', '-c', 'echo out; echo err >&2'], engine='selector')
+        self.eq(p.stdout.lines, ['out'])
+        self.eq(p.stderr.lines, ['err'])
+
+    def test_stdin(self):
+        p = run('nl -w 1 -s :'.split(), stdin=['hello', b'world\n'], engine='selector')
+        self.eq(p.stdout.lines, ['1:hello', '2:world'])
+
+        Q = queue.Queue()
+        p = command('nl -w 1 -s :'.split(), stdin=Q, engine='selector')
+        p.run(wait=False)
+        Q.put('hello')
+        Q.join()
+        p.stdin.writeline('world')
+        p.stdin.close()
+        p.wait()
+        self.eq(p.stdout.lines, ['1:hello', '2:world'])
+
+    def test_stdin_broken_pipe(self):
+        p = command('true', stdin=True, engine='selector')
+        p.run(wait=False)
+        p.proc.wait()
+        for i in range(100):
+            p.stdin.writeline('x' * 1024)
+        p.stdin.close()
+        p.wait()
+        self.eq(p.returncode, 0)
+
+    def test_large_stdin(self):
+        data = [str(i) * 100 for i in range(10000)]
+        p = run(['wc', '-l'], stdin=data, engine='selector')
+        self.eq(p.stdout.lines[0].strip(), '10000')
+
+    def test_encoding_false(self):
+        p = run(['xxd', '-p'], stdin=b'\x31\x41\x59', encoding=False, engine='selector')
+        self.eq(b''.join(p.stdout.lines), b'314159\n')
+
+        p = command(['printf', 'abcdefg'], encoding=False, bufsize=3, engine=IOEngine()).run()
+        self.true(all(len(chunk) <= 3 for chunk in p.stdout.lines))
+        self.eq(b''.join(p.stdout.lines), b'abcdefg')
+
+    def test_single_thread(self):
+        engine = IOEngine()
+        p = run('true', engine=engine)
+        count = threading.active_count()
+
+        ps = [command('cat', stdin=True, engine=engine).run(wait=False) for i in range(20)]
+        self.eq(threading.active_count(), count)
+
+        for i, p in enumerate(ps):
+            p.stdin.writeline(str(i))
+            p.stdin.close()
+        for i, p in enumerate(ps):
+            p.wait()
+            self.eq(p.stdout.lines, [str(i)])
+
+    def test_broken_stream(self):
+        engine = IOEngine()
+        p1 = command('cat', stdin=True, engine=engine).run(wait=False)
+        p2 = command('cat', stdin=True, engine=engine).run(wait=False)
+
+        # Invalid data aborts stdin of p1, p2 is unaffected
+        p1.stdin.writeline(1)
+        p1.stdin.close()
+        with self.raises(TypeError):
+            p1.wait()
+        self.eq(p1.stdout.lines, [])
+
+        p2.stdin.writeline('wah')
+        p2.stdin.close()
+        p2.wait()
+        self.eq(p2.stdout.lines, ['wah'])
+
+    def test_subscriber_exception(self):
+        def callback(line):
+            raise ValueError(line)
+
+        p = command(['seq', 3], stdout=callback, engine=IOEngine())
+        p.run(wait=False)
+        with self.raises(ValueError):
+            p.wait()
+        self.eq(p.returncode, 0)
+
+    def test_invalid_engine(self):
+        with self.raises(ValueError):
+            command('true', engine='wah')
+
+        p = run('true', engine='thread')
+        self.eq(p.engine, None)
+
+
+class TestAsyncSubproc(TestCase):
+    def run_async(self, coro):
+        import asyncio
+        return asyncio.run(coro)
+
+    def test_arun(self):
+        async def main():
+            p = await arun('seq 5'.split())
+            self.eq(p.stdout.lines, '1 2 3 4 5'.split())
+            self.eq(p.returncode, 0)
+            self.false(p.alive)
+            self.false(p in children())
+
+            p = await arun(['sh', '-c', 'printf "a \\r\\nb"; echo err >&2; exit 3'])
+            self.eq(p.stdout.lines, ['a ', 'b'])
+            self.eq(p.stderr.lines, ['err'])
+            self.eq(p.returncode, 3)
+
+        self.run_async(main())
+
+    def test_subscribers(self):
+        async def main():
+            lines = []
+            Q = queue.Queue()
+            p = await arun('seq 3'.split(), stdout=(lines.append, Q))
+            self.eq(p.stdout.lines, [])
+            self.eq(lines, ['1', '2', '3'])
+            self.eq(queue_to_list(Q), ['1', '2', '3'])
+
+        self.run_async(main())
+
+    def test_stdin(self):
+        import asyncio
+        async def main():
+            p = await arun('nl -w 1 -s :'.split(), stdin=['hello', b'world\n'])
+            self.eq(p.stdout.lines, ['1:hello', '2:world'])
+
+            Q = queue.Queue()
+            p = command('nl -w 1 -s :'.split(), stdin=Q)
+            await p.arun(wait=False)
+            Q.put('hello')
+            await asyncio.get_event_loop().run_in_executor(None, Q.join)
+            p.stdin.close()
+            self.true(await p.async_wait())
+            self.eq(p.stdout.lines, ['1:hello'])
+
+        self.run_async(main())
+
+    def test_async_with_and_async_for(self):
+        async def main():
+            async with command('cat', stdin=True) as p:
+                self.true(p.alive)
+                self.true(p in children())
+                p.stdin.writeline('hello')
+                self.eq(await p.stdout.areadline(), 'hello')
+                p.stdin.writeline('world')
+                p.stdin.close()
+                self.eq([line async for line in p.stdout], ['world'])
+
+            self.eq(p.returncode, 0)
+            self.eq([line async for line in p.stdout], ['hello', 'world'])
+
+        self.run_async(main())
+
+    def test_callable(self):
+        async def prog(proc, *args):
+            self.eq(args, ('arg1',))
+            async for line in proc.stdin:
+                proc.stdout.writeline(line.upper())
+            return 2024
+
+        def sync_prog(proc):
+            for line in proc.stdin:
+                proc.stderr.writeline(line)
+            return 2025
+
+        async def main():
+            p = await arun([prog, 'arg1'], stdin=['hello', 'world'])
+            self.eq(p.stdout.lines, ['HELLO', 'WORLD'])
+            self.eq(p.returncode, 2024)
+
+            p = await arun(sync_prog, stdin=['hello'])
+            self.eq(p.stderr.lines, ['hello'])
+            self.eq(p.returncode, 2025)
+
+        self.run_async(main())
+
+    def test_callable_raises_exception(self):
+        async def prog(proc):
+            raise ValueError('wah')
+
+        async def main():
+            with self.raises(ValueError):
+                await arun(prog)
+
+        self.run_async(main())
+
+    def test_wait_and_kill(self):
+        import signal
+        async def main():
+            p = await arun(['sleep', 5], wait=0.01)
+            self.true(p.alive)
+            self.eq(p.poll(), None)
+            self.false(await p.async_wait(False))
+            self.false(await p.async_wait(0.01))
+
+            with self.raises(AlreadyRunningError):
+                await p.arun()
+
+            p.kill()
+            self.true(await p.async_wait())
+            self.eq(p.signaled, signal.SIGTERM)
+            self.eq(p.returncode, -signal.SIGTERM)
+
+        self.run_async(main())
+
+    def test_await_threaded_command(self):
+        async def main():
+            p = command('seq 3'.split()).run(wait=False)
+            self.true(await p)
+            self.eq(p.stdout.lines, ['1', '2', '3'])
+
+        self.run_async(main())
+
+    def test_sync_wait_from_other_thread(self):
+        async def main():
+            import asyncio
+            p = await arun(['sleep', '0.05'], wait=False)
+            loop = asyncio.get_event_loop()
+            self.true(await loop.run_in_executor(None, p.wait))
+
+        self.run_async(main())
+
+    def test_encoding_false(self):
+        async def main():
+            p = await arun(['printf', 'abcdefg'], encoding=False, bufsize=3)
+            self.true(all(len(chunk) <= 3 for chunk in p.stdout.lines))
+            self.eq(b''.join(p.stdout.lines), b'abcdefg')
+
+            chunks = []
+            p = await arun(['printf', 'abcdefg'], stdout=lambda view: chunks.append(view.tobytes()),
+                           encoding=False, zerocopy=True)
+            self.eq(b''.join(chunks), b'abcdefg')
+
+        self.run_async(main())
+
 
 class TestPipe(TestCase):
     def test_pipe(self):
@@ -457,6 +457,19 @@ class TestFakeTerminal(TestCase):
         self.eq(ft.cursor.y, 1)
         self.eq(ft.cursor.x, 2)
 
+    def test_scroll(self):
+        ft = iro.FakeTerminal(lines=3)
+        ft.puts('a\nb\nc')
+        self.eq(ft.lines, ['a', 'b', 'c'])
+        self.eq(ft.cursor, (2, 1))
+
+        ft.puts('\nd')
+        self.eq(ft.lines, ['b', 'c', 'd'])
+        self.eq(ft.cursor, (2, 1))
+
+        ft.puts('\033[5B')
+        self.eq(ft.cursor, (2, 1))
+
     def test_recording(self):
         ft = iro.FakeTerminal()
         self.false(ft.recording)
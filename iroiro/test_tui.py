@@ -19,10 +19,23 @@ class TestTypesettingUtils(TestCase):
         with self.raises(TypeError):
             charwidth('test')
 
+    def test_charwidth_zero_width(self):
+        self.eq(charwidth('\u0301'), 0) # combining acute accent
+        self.eq(charwidth('\u200b'), 0) # zero width space
+        self.eq(charwidth('\u200d'), 0) # zero width joiner
+        self.eq(charwidth('\ufe0f'), 0) # variation selector-16
+        self.eq(charwidth('\u1161'), 0) # hangul jungseong
+        self.eq(charwidth('\u00ad'), 1) # soft hyphen
+
     def test_strwidth(self):
         self.eq(strwidth('test'), 4)
         self.eq(strwidth(orange('test')), 4)
         self.eq(strwidth('哇嗚'), 4)
+        self.eq(strwidth('e\u0301'), 1)
+        self.eq(strwidth('\u2764\ufe0f'), 2)
+        self.eq(strwidth('\u2764'), 1)
+        self.eq(strwidth('👩\u200d💻'), 4)
+        self.eq(strwidth(orange('哇嗚')), 4)
 
     def test_wrap(self):
         self.eq(wrap('嗚啦呀哈', 1), ('', '嗚啦呀哈'))
@@ -45,6 +58,11 @@ class TestTypesettingUtils(TestCase):
         self.eq(wrap('嗚啦呀哈', 8, clip='>'), ('嗚啦呀哈', ''))
         self.eq(wrap('嗚啦呀哈', 9, clip='>'), ('嗚啦呀哈', ''))
 
+        self.eq(wrap('test', 0), ('', 'test'))
+        self.eq(wrap('test', -1), ('', 'test'))
+        self.eq(wrap('test', 3, clip='>'), ('tes', 't'))
+        self.eq(wrap('test', 5), ('test', ''))
+
         with self.raises(ValueError):
             wrap('whatever', 1, clip=1)
 
@@ -191,6 +209,111 @@ class TestTypesettingUtils(TestCase):
                     ('word3  ', 'multiple words', '     '),
                     ])
 
+    def test_just_generator_without_width(self):
+        data = [
+                ('column1', 'col2'),
+                ('word1', 'word2'),
+                ]
+
+        self.eq(ljust(vector for vector in data), [
+            ('column1', 'col2 '),
+            ('word1  ', 'word2'),
+            ])
+
+    def test_just_with_sample(self):
+        def rows():
+            yield ('a', 'bb')
+            yield ('ccc', 'd')
+            yield ('eeeee', 'f', 'extra')
+            yield ('哇嗚哇', 'g')
+
+        ret = ljust(rows(), sample=2)
+        self.false(isinstance(ret, (tuple, list)))
+        self.eq(list(ret), [
+            ('a  ', 'bb'),
+            ('ccc', 'd '),
+            ('eeeee', 'f ', 'extra'),
+            ('哇嗚哇', 'g '),
+            ])
+
+        self.eq(list(rjust(rows(), sample=2, truncate=True)), [
+            ('  a', 'bb'),
+            ('ccc', ' d'),
+            ('eee', ' f', 'extra'),
+            (' 哇', ' g'),
+            ])
+
+    def test_just_truncate(self):
+        self.eq(ljust('test', 2, truncate=True), 'te')
+        self.eq(ljust('哇嗚', 3, truncate=True), '哇 ')
+        self.eq(ljust(orange('test'), 2, truncate=True), orange('te'))
+        self.eq(ljust(orange('te') + 'st', 3, truncate=True), orange('te') + 's')
+        self.eq(ljust('\033[1mte' + 'st', 3, truncate=True), '\033[1mtes\033[m')
+        self.eq(ljust('\033[38;5;0mte\033[0;1mst', 3, truncate=True), '\033[38;5;0mte\033[0;1ms\033[m')
+        self.eq(ljust('\033[38;2;0;0;0mte\033[0mst', 3, truncate=True), '\033[38;2;0;0;0mte\033[0ms')
+        self.eq(ljust(orange('test'), 5, truncate=True), orange('test') + ' ')
+
+        self.eq(ljust([('column1', 'col2')], width=(3, 3), truncate=True),
+                [('col', 'col')])
+
+
+class TestTable(TestCase):
+    data = [
+            ('column1', 'col2'),
+            ('哇嗚', orange('word2')),
+            ('word3', 'word4 long words'),
+            ]
+
+    def test_measure(self):
+        table = Table(self.data)
+        self.eq(len(table), 3)
+        self.eq(table.widths, [7, 16])
+        self.eq(table.rows[1], (('哇嗚', 4), (orange('word2'), 5)))
+
+        table.append(('a', 'b', 'longer column'))
+        self.eq(table.widths, [7, 16, 13])
+
+    def test_render(self):
+        table = Table(self.data)
+        self.eq(table.render(), [
+            'column1 col2            ',
+            '哇嗚    ' + orange('word2') + ' ' * 11,
+            'word3   word4 long words',
+            ])
+        self.eq(table.render(sep=' | ', rjust=True), [
+            'column1 |             col2',
+            '   哇嗚 | ' + ' ' * 11 + orange('word2'),
+            '  word3 | word4 long words',
+            ])
+        self.eq(table.render(), [' '.join(row) for row in table.ljust()])
+
+    def test_fixed_width(self):
+        table = Table(self.data, width=(6, 8))
+        self.eq(table.widths, [])
+        self.eq(table.ljust()[0], ('column1', 'col2    '))
+
+    def test_stream_sample(self):
+        def rows():
+            yield ('a', 'bb')
+            yield ('ccc', 'd')
+            yield ('eeeee', 'f')
+            yield ('g',)
+
+        table = Table()
+        ret = table.stream(rows(), sample=2)
+        self.false(isinstance(ret, (tuple, list)))
+        self.eq(list(ret), [
+            ('a  ', 'bb'),
+            ('ccc', 'd '),
+            ('eeeee', 'f '),
+            ('g  ', '  '),
+            ])
+        self.eq(table.rows, [])
+
+    def test_stream_without_sample(self):
+        table = Table()
+        self.eq(list(table.stream(iter(self.data), rjust=True)), rjust(self.data))
+
 
 def queue_to_list(Q):
     ret = []
@@ -341,6 +464,220 @@ class TestThreadedSpinner(TestCase):
             self.eq(expected, behavior)
 
 
+class TestSpinnerAnimator(TestCase):
+    def setUp(self):
+        from .lib_test_utils import FakeTerminal
+        self.terminal = FakeTerminal()
+        self.patch('shutil.get_terminal_size', lambda: self.terminal.get_terminal_size())
+
+        self.canvas = PseudoCanvas()
+        self.canvas.print = self.terminal.print
+
+    def test_tick(self):
+        animator = SpinnerAnimator(self.canvas)
+        self.true(animator.canvas is self.canvas)
+
+        s1 = ThreadedSpinner('ab', 'cd', 'E', delay=1, animator=animator)
+        s2 = ThreadedSpinner('xyz', delay=2, animator=animator)
+        s1.text('job1')
+        s1.start()
+        s2.start()
+        s2.start()
+        s2.text('job2')
+
+        self.terminal.recording = True
+        animator.tick(0)
+        self.eq(self.terminal.lines, ['a job1', 'xyz job2'])
+
+        # All spinners are drawn in one write
+        self.eq(len(self.terminal.recording), 1)
+
+        animator.tick(1)
+        self.eq(self.terminal.lines, ['b job1', 'xyz job2'])
+
+        animator.tick(2)
+        self.eq(self.terminal.lines, ['c job1', 'xyz job2'])
+
+        s1.end(wait=False)
+        s1.text('done')
+        animator.tick(2.5)
+        self.eq(self.terminal.lines, ['E done', 'xyz job2'])
+        self.false(s1.finished.is_set())
+
+        animator.tick(3)
+        self.eq(self.terminal.lines, ['E done', 'xyz job2'])
+        self.true(s1.finished.is_set())
+        self.eq(list(animator.spinners), [s2])
+        s1.join()
+
+        animator.tick(4)
+        self.eq(self.terminal.lines, ['E done', 'xyz job2'])
+
+    def test_run(self):
+        with SpinnerAnimator(self.canvas, delay=0.001) as animator:
+            spinners = [ThreadedSpinner(delay=0, animator=animator) for i in range(10)]
+            for i, spinner in enumerate(spinners):
+                spinner.start()
+                spinner.text('job', i)
+
+            spinners[0].end()
+            self.true(spinners[0].finished.is_set())
+
+        self.true(all(spinner.finished.is_set() for spinner in spinners))
+        self.eq(self.terminal.lines, ['⣿ job {}'.format(i) for i in range(10)] + [''])
+        self.eq(animator.thread, None)
+
+    def test_finished_when_removed(self):
+        animator = SpinnerAnimator(self.canvas)
+        spinner = ThreadedSpinner('a', 'b', 'C', delay=1, animator=animator)
+        spinner.start()
+
+        # The spinner is never seen removed but not finished
+        states = []
+        self.canvas.render = lambda: states.append(
+                (spinner in animator.spinners, spinner.finished.is_set()))
+        animator.tick(0)
+        spinner.end(wait=False)
+        for now in range(1, 5):
+            animator.tick(now)
+        self.eq(states[0], (True, False))
+        self.eq(states[-1], (False, True))
+        self.true(all(animated != finished for animated, finished in states))
+
+    def test_join_not_animated(self):
+        animator = SpinnerAnimator(self.canvas)
+
+        # Neither the spinner nor the animator is started
+        spinner = ThreadedSpinner(animator=animator)
+        spinner.end()
+        self.false(spinner.finished.is_set())
+
+        # The animator is not started
+        spinner = ThreadedSpinner(animator=animator)
+        spinner.start()
+        spinner.end()
+        self.false(spinner.finished.is_set())
+
+        ThreadedSpinner().join()
+
+
+class TestAsyncSpinner(TestCase):
+    def test_run(self):
+        import asyncio
+
+        output = []
+        async def main():
+            spinner = AsyncSpinner('ab', 'cd', 'EF', delay=0.001)
+            spinner.print = lambda *args, **kwargs: output.append(''.join(args))
+            spinner.text('meow')
+            self.eq(output, [])
+
+            async with spinner:
+                spinner.start()
+                await asyncio.sleep(0.02)
+                spinner.text('woof')
+
+            self.true(spinner.task.done())
+
+        asyncio.run(main())
+
+        self.eq(output[0], '\ra\033[K meow')
+        self.eq(output[1], '\rb\033[K meow')
+        self.eq(output[-3:], ['\rE\033[K woof', '\rF\033[K woof', ''])
+        self.true(all(line[1] in 'abcdEF' for line in output[:-1]))
+
+    def test_end(self):
+        import asyncio
+
+        async def main():
+            spinner = AsyncSpinner('ab', 'cd', 'EF', delay=0.001)
+            spinner.print = lambda *args, **kwargs: None
+
+            # Never started
+            await spinner.ajoin()
+            spinner.join()
+
+            spinner.start()
+            with self.raises(RuntimeError):
+                spinner.end()
+
+            await spinner.aend()
+            self.true(spinner.task.done())
+            spinner.end()
+
+        asyncio.run(main())
+
+
+class TestProgressBar(TestCase):
+    def setUp(self):
+        self.sys_time = 0
+        self.patch('time.monotonic', lambda: self.sys_time)
+        self.output = []
+
+    def new_bar(self, *args, **kwargs):
+        bar = ProgressBar(*args, **kwargs)
+        bar.print = lambda *args, **kwargs: self.output.append(''.join(args))
+        return bar
+
+    def test_line(self):
+        bar = self.new_bar(100, width=10)
+        self.eq(bar.line(), '[----------] 0/100 0.0/s')
+
+        bar.start()
+        self.sys_time = 2
+        bar.update(50)
+        self.eq(bar.rate, 25)
+        self.eq(bar.eta, 2)
+        self.eq(bar.line(), '[#####-----] 50/100 25.0/s ETA 0:02')
+
+        bar.text('downloading')
+        self.eq(bar.text(), 'downloading')
+        self.eq(bar.line(), '[#####-----] 50/100 25.0/s ETA 0:02 downloading')
+
+        self.sys_time = 0
+        bar = self.new_bar()
+        bar.update(3)
+        self.sys_time = 4
+        self.eq(bar.line(), '3 0.8/s')
+
+    def test_format_duration(self):
+        from iroiro.lib_tui import format_duration
+        self.eq(format_duration(0), '0:00')
+        self.eq(format_duration(61.5), '1:01')
+        self.eq(format_duration(3600 * 25 + 62), '25:01:02')
+
+    def test_refresh_rate_limited(self):
+        with self.new_bar(10, width=2, delay=1) as bar:
+            for i in bar.iter(range(10)):
+                self.sys_time += 0.25
+
+        self.eq(self.output, [
+            '\r[--] 1/10 4.0/s ETA 0:02\033[K',
+            '\r[#-] 5/10 4.0/s ETA 0:01\033[K',
+            '\r[#-] 9/10 4.0/s ETA 0:00\033[K',
+            '\r[##] 10/10 4.0/s ETA 0:00\033[K',
+            '',
+            ])
+
+    def test_async(self):
+        import asyncio
+
+        async def numbers():
+            for i in range(5):
+                await asyncio.sleep(0)
+                yield i
+
+        async def main():
+            async with self.new_bar(5, width=5, delay=0) as bar:
+                ret = [i async for i in bar.aiter(numbers())]
+            self.true(bar.task.done())
+            return ret
+
+        self.sys_time = 1
+        self.eq(asyncio.run(main()), [0, 1, 2, 3, 4])
+        self.eq(self.output[-2:], ['\r[#####] 5/5 0.0/s\033[K', ''])
+
+
 class TestPromotAskUser(TestCase):
     def setUp(self):
         self.input_queue = None
@@ -671,12 +1008,18 @@ class TestKey(TestCase):
 
 class TestGetch(TestCase):
     def setUp(self):
+        from . import lib_tui
+        lib_tui._getch_queue.clear()
         self.patch('sys.stdin.fileno', self.mock_stdin_fileno)
         self.patch('select.select', self.mock_select)
         self.patch('os.read', self.mock_read)
         self.patch('tty.setraw', self.mock_setraw)
         self.patch('termios.tcgetattr', self.mock_tcgetattr)
         self.patch('termios.tcsetattr', self.mock_tcsetattr)
+        self.patch('sys.stdout.isatty', lambda: self.stdout_isatty)
+        self.patch('builtins.print', lambda *args, **kwargs: self.output.append(''.join(args)))
+        self.stdout_isatty = False
+        self.output = []
         self.buffer = bytearray()
         self.default_term_attr = [
                 'iflag', 'oflag', 'cflag', 'lflag',
@@ -806,6 +1149,275 @@ class TestGetch(TestCase):
         self.press(KEY_HOME.seq)
         self.eq(getch(), MY_HOME)
 
+    def test_key_trie(self):
+        from .lib_tui import key_trie
+        self.false(ord('Q') in key_trie[1])
+
+        QQ = register_key('QQ', 'QQ')
+        QQQ = register_key('QQQ', 'QQQ')
+        self.eq(key_trie[1][ord('Q')][1][ord('Q')][0], QQ)
+        self.eq(key_trie[1][ord('Q')][1][ord('Q')][1][ord('Q')][0], QQQ)
+
+        self.press('QQQQQ')
+        self.eq(getch(), QQQ)
+        self.eq(getch(), QQ)
+        self.eq(getch(), None)
+
+        deregister_key(QQQ)
+        self.eq(key_trie[1][ord('Q')][1][ord('Q')], [QQ, {}])
+        deregister_key(QQ)
+        self.false(ord('Q') in key_trie[1])
+
+    def test_getch_esc_timeout(self):
+        timeouts = []
+        def mock_select(rlist, wlist, xlist, timeout=None):
+            timeouts.append(timeout)
+            return self.mock_select(rlist, wlist, xlist, timeout)
+        self.patch('select.select', mock_select)
+
+        self.press('\033')
+        self.eq(getch(esc_timeout=0.5), KEY_ESCAPE)
+        self.eq(timeouts, [None, 0, 0.5])
+
+        timeouts.clear()
+        self.press('測')
+        self.eq(getch(esc_timeout=0.5), '測')
+        self.eq(timeouts, [None, 0])
+
+    def test_getch_bulk(self):
+        reads = []
+        def mock_read(fd, n):
+            reads.append(n)
+            return self.mock_read(fd, n)
+        self.patch('os.read', mock_read)
+
+        setraw = []
+        def mock_setraw(fd, when=None):
+            setraw.append(fd)
+            self.mock_setraw(fd, when)
+        self.patch('tty.setraw', mock_setraw)
+
+        self.press('abc\033[A' * 100)
+        self.eq(getch(), 'a')
+        self.eq(len(reads), 1)
+        self.eq(len(setraw), 1)
+
+        keys = [getch() for i in range(399)]
+        self.eq(keys[:5], ['b', 'c', KEY_UP, 'a', 'b'])
+        self.eq(keys[-1], KEY_UP)
+        self.eq(len(reads), 1)
+        self.eq(len(setraw), 1)
+        self.eq(getch(), None)
+
+    def test_getch_bracketed_paste(self):
+        self.press('\033[200~paste 測試\r\033[A\033[201~q')
+        key = getch()
+        self.eq(key, 'paste 測試\r\033[A')
+        self.true(isinstance(key, Paste))
+        self.eq(repr(key), "Paste('paste 測試\\r\\x1b[A')")
+        self.eq(getch(), 'q')
+        self.eq(getch(), None)
+
+    def test_getch_paste_mode(self):
+        self.press('a')
+        self.eq(getch(), 'a')
+        self.eq(self.output, [])
+
+        self.stdout_isatty = True
+        self.press('b')
+        self.eq(getch(), 'b')
+        self.eq(self.output, ['\033[?2004h', '\033[?2004l'])
+
+    def test_getch_encoding_change(self):
+        self.press('abé')
+        self.eq(getch(), 'a')
+        self.eq(getch(encoding='latin-1'), 'b')
+        self.eq(getch(encoding='latin-1'), 'Ã')
+        self.eq(getch(encoding='latin-1'), '©')
+        self.eq(getch(), None)
+
+
+class TestKeyReader(TestCase):
+    def setUp(self):
+        import os
+        self.rfd, self.wfd = os.pipe()
+
+    def tearDown(self):
+        import os
+        os.close(self.rfd)
+        if self.wfd is not None:
+            os.close(self.wfd)
+
+    def press(self, data):
+        import os
+        if isinstance(data, str):
+            data = data.encode('utf8')
+        os.write(self.wfd, data)
+
+    def eof(self):
+        import os
+        os.close(self.wfd)
+        self.wfd = None
+
+    def test_get(self):
+        reader = KeyReader(self.rfd)
+        self.eq(reader.get(0), None)
+        self.press('a測\033[AA\033[Z')
+        self.eq(reader.get(0), 'a')
+        self.eq(len(reader.queue), 4)
+        self.eq(reader.get(0), '測')
+        self.eq(reader.get(0), KEY_UP)
+        self.eq(reader.get(0), 'A')
+        self.eq(reader.get(0), '\033[Z')
+        self.eq(reader.get(0), None)
+        self.false(reader.eof)
+
+        self.press('測'.encode('utf8')[:-1])
+        self.eq(reader.get(0), '測'.encode('utf8')[:-1])
+
+    def test_esc_timeout(self):
+        import threading
+        reader = KeyReader(self.rfd, esc_timeout=1)
+        self.press('\033')
+        threading.Timer(0.01, self.press, ('[A',)).start()
+        self.eq(reader.get(0), KEY_UP)
+
+        reader.esc_timeout = 0
+        self.press('\033')
+        self.eq(reader.get(0), KEY_ESCAPE)
+        self.eq(reader.buffer, b'')
+
+    def test_decode_burst(self):
+        from .lib_tui import _decode_keys
+        self.eq(_decode_keys('ab\033[A\033OP測\033x\033'.encode('utf8'), 'utf8'),
+                (['a', 'b', KEY_UP, KEY_F1, '測', '\033x', KEY_ESCAPE], 14))
+
+        data = '測'.encode('utf8')
+        self.eq(_decode_keys(b'a\033[' + data[:2], 'utf8', final=False), (['a'], 1))
+        self.eq(_decode_keys(b'a' + data[:2], 'utf8', final=False), (['a'], 1))
+        self.eq(_decode_keys(b'a' + data[:2], 'utf8'), (['a', data[:2]], 3))
+
+    def test_bracketed_paste(self):
+        import threading
+        reader = KeyReader(self.rfd, esc_timeout=1)
+        self.press('a\033[200~line1\r')
+        threading.Timer(0.01, self.press, ('line2\033[201~b',)).start()
+        self.eq(reader.get(0), 'a')
+        self.eq(reader.get(0), Paste('line1\rline2'))
+        self.eq(reader.get(0), 'b')
+
+        reader.esc_timeout = 0
+        self.press('\033[200~unterminated')
+        self.eq(reader.get(0), Paste('unterminated'))
+
+    def test_paste_scan(self):
+        from .lib_tui import _decode_keys
+        data = b'\033[200~ab\033[201~'
+        self.eq(_decode_keys(data, 'utf8', final=False), ([Paste('ab')], len(data)))
+        self.eq(_decode_keys(data, 'utf8', final=False, scan=len(data)), ([], 0))
+
+        reader = KeyReader(self.rfd)
+        for chunk in (b'\033[200~line1', b'line2\033[2', b'01~x'):
+            reader.buffer += chunk
+            reader.decode(final=False)
+            if reader.buffer:
+                self.eq(reader.paste_scan, len(reader.buffer) - 5)
+        self.eq(list(reader.queue), [Paste('line1line2'), 'x'])
+        self.eq(reader.paste_scan, 0)
+
+    def test_paste_mode(self):
+        import pty
+        import os
+        master, slave = pty.openpty()
+        output = []
+        self.patch('builtins.print', lambda *args, **kwargs: output.append(''.join(args)))
+        try:
+            with KeyReader(slave, paste=True):
+                self.eq(output, ['\033[?2004h'])
+            self.eq(output, ['\033[?2004h', '\033[?2004l'])
+        finally:
+            os.close(master)
+            os.close(slave)
+
+    def test_bulk_read(self):
+        import os
+        reads = []
+        def mock_read(fd, n):
+            reads.append(n)
+            return os_read(fd, n)
+        os_read = os.read
+        self.patch('os.read', mock_read)
+
+        reader = KeyReader(self.rfd, bufsize=16)
+        self.press('x' * 40)
+        self.true(reader.fill(0))
+        self.eq(reads, [16, 16, 16])
+        self.eq(list(reader.queue), ['x'] * 40)
+
+    def test_iter(self):
+        self.press('ab\033[B')
+        self.eof()
+        with KeyReader(self.rfd) as reader:
+            self.eq(list(reader), ['a', 'b', 'down'])
+            self.true(reader.eof)
+            self.eq(reader.get(), None)
+
+    def test_raw_mode(self):
+        import os
+        import pty
+        import termios
+        master, slave = pty.openpty()
+        try:
+            orig = termios.tcgetattr(slave)
+            with KeyReader(slave) as reader:
+                self.eq(reader.orig_term_attr, orig)
+                self.eq(termios.tcgetattr(slave)[3] & termios.ICANON, 0)
+                os.write(master, b'q\033OP')
+                self.eq(reader.get(1), 'q')
+                self.eq(reader.get(1), KEY_F1)
+            self.eq(termios.tcgetattr(slave), orig)
+        finally:
+            os.close(master)
+            os.close(slave)
+
+    def test_async(self):
+        import asyncio
+
+        async def main():
+            reader = KeyReader(self.rfd)
+            loop = asyncio.get_event_loop()
+            loop.call_soon(self.press, 'a')
+            self.eq(await reader.aget(), 'a')
+
+            loop.call_later(0.01, self.press, 'b\033[C')
+            loop.call_later(0.02, self.eof)
+            return [key async for key in reader]
+
+        self.eq(asyncio.run(main()), ['b', KEY_RIGHT])
+
+    def test_async_esc_timeout(self):
+        import asyncio
+        import time
+
+        async def ticker(ticks):
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            reader = KeyReader(self.rfd, esc_timeout=0.2)
+            ticks = []
+            task = asyncio.get_running_loop().create_task(ticker(ticks))
+            self.press('\033')
+            key = await reader.aget()
+            task.cancel()
+            return key, ticks
+
+        # Event loop keeps running while waiting for the rest of the sequence
+        key, ticks = asyncio.run(main())
+        self.eq(key, KEY_ESCAPE)
+        self.gt(len(ticks), 5)
+
 
 class TestPseudoCanvas(TestCase):
     def setUp(self):
@@ -905,8 +1517,8 @@ class TestPseudoCanvas(TestCase):
         self.terminal.recording = True
         pc.render()
 
-        # Check pc sent 24 sequences for each individual line
-        self.eq(len(self.terminal.recording), 24)
+        # Check pc sent all lines in one write
+        self.eq(len(self.terminal.recording), 1)
         self.terminal.recording = False
 
         # Check terminal has 24 lines
@@ -915,7 +1527,7 @@ class TestPseudoCanvas(TestCase):
             self.eq(self.terminal.lines[i - 26], '哇 {}'.format(i))
 
         # Check cursor position
-        self.eq(self.terminal.cursor.y, 23)
+        self.eq(self.terminal.cursor, (23, 5))
 
         # Update a visible line and an invisible line
         self.terminal.recording = True
@@ -923,18 +1535,331 @@ class TestPseudoCanvas(TestCase):
         pc[40] = '哇 40 (new)'
         pc.render()
 
-        # The last line is always updated in order to restore cursor position
+        # Only the changed cells are updated, and cursor is parked at the end of last line
         self.eq(self.terminal.recording, [
-            '\r\033[9A',
-            '\r哇 40 (new)\033[K\n',
-            '\r\033[8B',
-            '\r哇 49\033[K'])
+            '\033[9A' + '\r\033[5C\033[K (new)' + '\033[9B' + '\r\033[5C'])
+        self.eq(self.terminal.lines[14], '哇 40 (new)')
+        self.eq(self.terminal.cursor, (23, 5))
         self.terminal.recording = False
 
         # Try a hard re-render
         self.terminal.recording = True
         pc[40] = '哇 40'
         pc.render(all=True)
-        self.eq(self.terminal.recording, ['\r\033[23A'] +
-                ['\r哇 {}\033[K\n'.format(i) for i in range(26, 49)] +
-                ['\r哇 49\033[K'])
+        self.eq(self.terminal.recording, ['\033[23A' +
+                '\n'.join('\r\033[K哇 {}'.format(i) for i in range(26, 50))])
+        self.eq(self.terminal.cursor, (23, 5))
+
+    def test_render_nothing_changed(self):
+        pc = PseudoCanvas()
+        pc.print = self.terminal.print
+        pc.extend(['wah1', 'wah2'])
+        self.gt(pc.render(), 0)
+
+        self.terminal.recording = True
+        pc[0] = 'wah1'
+        self.eq(pc.render(), 0)
+        self.eq(self.terminal.recording, [])
+
+    def test_render_diff(self):
+        pc = PseudoCanvas()
+        pc.print = self.terminal.print
+        pc.extend(['progress: 10%', orange('wah'), 'done'])
+        pc.render()
+
+        self.terminal.recording = True
+        pc[0] = 'progress: 9%'
+        pc[1] = orange('woo')
+        pc[2] = 'done!'
+        pc.render()
+        self.eq(self.terminal.recording, [
+            '\033[2A' + '\r\033[10C\033[K9%' +
+            '\n' + '\r\033[K' + orange('woo') +
+            '\n' + '\r\033[4C\033[K!'
+            ])
+        self.eq(self.terminal.lines, ['progress: 9%', 'woo', 'done!'])
+
+    def test_diff_line(self):
+        pc = PseudoCanvas()
+        self.eq(pc.diff_line(None, 'wah'), '\r\033[Kwah')
+        self.eq(pc.diff_line('wah', 'woo'), '\r\033[1C\033[Koo')
+        self.eq(pc.diff_line('wah', 'xyz'), '\r\033[Kxyz')
+        self.eq(pc.diff_line('哇a', '哇b'), '\r\033[2C\033[Kb')
+
+        # Combining marks are redrawn with the char they attached to
+        self.eq(pc.diff_line('ae\u0301', 'ae\u0300'), '\r\033[1C\033[Ke\u0300')
+        self.eq(pc.diff_line('ae', 'ae\u0300'), '\r\033[1C\033[Ke\u0300')
+
+    def test_render_stats(self):
+        pc = PseudoCanvas()
+        pc.print = self.terminal.print
+        pc.extend(['wah1', '哇2'])
+
+        frame1 = len('\r\033[Kwah1\n\r\033[K哇2'.encode('utf8'))
+        frame2 = len('\033[1A\r\033[3C\033[K3\n\r\033[3C')
+        self.eq(pc.render(), frame1)
+        pc[0] = 'wah3'
+        self.eq(pc.render(), frame2)
+        self.eq(pc.render(), 0)
+
+        self.eq(pc.frames, 2)
+        self.eq(pc.bytes_written, frame1 + frame2)
+
+    def test_render_follow_tail(self):
+        self.terminal.height = 5
+        pc = PseudoCanvas()
+        pc.print = self.terminal.print
+        pc.extend(['line {}'.format(i) for i in range(3)])
+        pc.render()
+        self.eq(self.terminal.lines, ['line 0', 'line 1', 'line 2'])
+
+        for i in range(3, 100000):
+            pc.append('line {}'.format(i))
+        pc.render()
+        self.eq(self.terminal.lines, ['line {}'.format(i) for i in range(99995, 100000)])
+        self.eq(self.terminal.cursor, (4, 10))
+
+        # New lines scroll the screen, and only new lines are drawn
+        self.terminal.recording = True
+        pc.append('line 100000')
+        pc.append('line 100001')
+        pc.render()
+        self.eq(self.terminal.recording, ['\n\n\033[1A\r\033[Kline 100000\n\r\033[Kline 100001'])
+        self.eq(self.terminal.lines, ['line {}'.format(i) for i in range(99997, 100002)])
+
+    def test_render_scroll(self):
+        self.terminal.height = 3
+        pc = PseudoCanvas()
+        pc.print = self.terminal.print
+        pc.extend(['line {}'.format(i) for i in range(10)])
+        pc.render()
+        self.eq(self.terminal.lines, ['line 7', 'line 8', 'line 9'])
+
+        pc.scroll = 2
+        pc.render()
+        self.eq(self.terminal.lines, ['line 5', 'line 6', 'line 7'])
+        self.eq(self.terminal.cursor, (2, 6))
+
+        # Viewport stays on the same lines
+        pc.append('line 10')
+        self.eq(pc.scroll, 3)
+        self.eq(pc.render(), 0)
+
+        pc.scroll = 100
+        self.eq(pc.scroll, 10)
+        pc.render()
+        self.eq(pc.scroll, 8)
+        self.eq(self.terminal.lines, ['line 0', 'line 1', 'line 2'])
+
+        pc.scroll = 0
+        pc.render()
+        self.eq(self.terminal.lines, ['line 8', 'line 9', 'line 10'])
+        self.eq(self.terminal.cursor, (2, 7))
+
+    def test_render_maxlen(self):
+        self.terminal.height = 3
+        pc = PseudoCanvas(maxlen=5)
+        pc.print = self.terminal.print
+        pc.extend(['line {}'.format(i) for i in range(10)])
+        self.eq(list(pc), ['line {}'.format(i) for i in range(5, 10)])
+        self.eq(pc[0], 'line 5')
+
+        pc.render()
+        self.eq(self.terminal.lines, ['line 7', 'line 8', 'line 9'])
+
+        pc[-2] = 'line 8 (new)'
+        pc.append('line 10')
+        pc.render()
+        self.eq(self.terminal.lines, ['line 8 (new)', 'line 9', 'line 10'])
+
+        pc.scroll = 100
+        pc.render()
+        self.eq(self.terminal.lines, ['line 6', 'line 7', 'line 8 (new)'])
+
+    def test_render_maxlen_dropped(self):
+        self.terminal.height = 2
+        pc = PseudoCanvas(maxlen=5)
+        pc.print = self.terminal.print
+        pc.extend(['line {}'.format(i) for i in range(7)])
+        self.eq(pc.dirty, set(range(7)))
+
+        pc[1] = 'line 3 (new)'
+        pc.render()
+        self.eq(self.terminal.lines, ['line 5', 'line 6'])
+
+        pc.append('line 7')
+        self.eq(pc.dirty, {7})
+        pc.render()
+        self.eq(self.terminal.lines, ['line 6', 'line 7'])
+
+    def test_render_thread(self):
+        pc = PseudoCanvas(fps=5)
+        pc.print = self.terminal.print
+        pc.extend(['worker {}: 0'.format(i) for i in range(4)])
+
+        def worker(i):
+            for n in range(1, 501):
+                pc[i] = 'worker {}: {}'.format(i, n)
+                pc.render()
+
+        with pc:
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.eq(pc.thread, None)
+        self.eq(self.terminal.lines, ['worker {}: 500'.format(i) for i in range(4)])
+        self.eq(self.terminal.cursor, (3, len('worker 3: 500')))
+
+        # 2000 updates are coalesced into a few frames
+        self.lt(pc.frames, 20)
+
+    def test_render_thread_resize(self):
+        import time
+        import signal
+        from iroiro import lib_tui
+
+        orig = signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+        self.addCleanup(signal.signal, signal.SIGWINCH, orig)
+
+        count = 0
+        def get_terminal_size():
+            nonlocal count
+            count += 1
+            return self.terminal.get_terminal_size()
+
+        self.patch('shutil.get_terminal_size', get_terminal_size)
+
+        pc = PseudoCanvas(fps=100)
+        pc.print = self.terminal.print
+        pc.extend(['wah1', 'wah2'])
+        with pc:
+            self.true(pc.term_size_watched)
+            pc.render()
+            for i in range(100):
+                if self.terminal.lines == ['wah1', 'wah2']:
+                    break
+                time.sleep(0.01)
+
+            # Idle canvas doesn't check the terminal size
+            time.sleep(0.1)
+            self.eq(count, 1)
+
+            # Resizing alone triggers a redraw
+            self.terminal.width = 3
+            lib_tui._sigwinch_count += 1
+            for i in range(100):
+                if self.terminal.lines == ['wah', 'wah']:
+                    break
+                time.sleep(0.01)
+            self.eq(self.terminal.lines, ['wah', 'wah'])
+
+    def test_render_thread_slow_terminal(self):
+        gate = threading.Event()
+        printing = threading.Event()
+        def slow_print(*args, **kwargs):
+            printing.set()
+            gate.wait()
+            self.terminal.print(*args, **kwargs)
+
+        pc = PseudoCanvas()
+        pc.print = slow_print
+        pc.extend(['wah1', 'wah2'])
+        with pc:
+            pc.render()
+            self.true(printing.wait(1))
+
+            # Producers don't wait for terminal I/O
+            t = threading.Thread(target=pc.__setitem__, args=(0, 'wah3'))
+            t.start()
+            t.join(1)
+            self.false(t.is_alive())
+            gate.set()
+
+        self.eq(self.terminal.lines, ['wah3', 'wah2'])
+
+    def test_render_thread_stop_without_update(self):
+        pc = PseudoCanvas()
+        pc.print = self.terminal.print
+        pc.start()
+        pc.start()
+        pc.stop()
+        self.eq(pc.frames, 0)
+
+    def test_watch_terminal_size(self):
+        import signal
+        from iroiro import lib_tui
+
+        called = []
+        def handler(signum, frame):
+            called.append(signum)
+
+        orig = signal.signal(signal.SIGWINCH, handler)
+        self.addCleanup(signal.signal, signal.SIGWINCH, orig)
+        patcher = unittest.mock.patch.object(lib_tui, '_sigwinch_watchers', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        pc1 = PseudoCanvas()
+        pc2 = PseudoCanvas()
+        pc1.start()
+        pc2.start()
+        self.true(pc1.term_size_watched)
+        self.true(signal.getsignal(signal.SIGWINCH) is lib_tui._sigwinch_handler)
+
+        # Previous handler is chained
+        count = lib_tui._sigwinch_count
+        lib_tui._sigwinch_handler(signal.SIGWINCH, None)
+        self.eq(called, [signal.SIGWINCH])
+        self.eq(lib_tui._sigwinch_count, count + 1)
+
+        # Previous handler is restored after the last canvas is stopped
+        pc1.stop()
+        self.true(signal.getsignal(signal.SIGWINCH) is lib_tui._sigwinch_handler)
+        pc2.stop()
+        self.true(signal.getsignal(signal.SIGWINCH) is handler)
+        pc2.stop()
+        self.true(signal.getsignal(signal.SIGWINCH) is handler)
+
+    def test_render_keeps_sigwinch_handler(self):
+        import signal
+
+        orig = signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+        self.addCleanup(signal.signal, signal.SIGWINCH, orig)
+
+        pc = PseudoCanvas()
+        pc.print = self.terminal.print
+        pc.append('wah')
+        pc.render()
+        self.false(pc.term_size_watched)
+        self.eq(signal.getsignal(signal.SIGWINCH), signal.SIG_DFL)
+
+    def test_terminal_size_cached(self):
+        from iroiro import lib_tui
+
+        count = 0
+        def get_terminal_size():
+            nonlocal count
+            count += 1
+            return self.terminal.get_terminal_size()
+
+        self.patch('shutil.get_terminal_size', get_terminal_size)
+
+        pc = PseudoCanvas()
+        pc.print = self.terminal.print
+        pc.term_size_watched = True
+        pc.extend(['wah1', 'wah2'])
+        pc.render()
+        pc[0] = 'wah3'
+        pc.render()
+        self.eq(count, 1)
+
+        # Resized, all lines are redrawn
+        self.terminal.width = 3
+        lib_tui._sigwinch_handler(None, None)
+        self.terminal.recording = True
+        pc.render()
+        self.eq(count, 2)
+        self.eq(self.terminal.recording, ['\033[1A\r\033[Kwah\n\r\033[Kwah'])
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import sys
+import timeit
+
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import iroiro
+from iroiro import color
+
+
+def bench(name, stmt, number):
+    t = min(timeit.repeat(stmt, number=number, repeat=5, globals=globals()))
+    print('{:<40} {:>10.2f} us'.format(name, t / number * 1e6))
+
+
+def long_mixed_sgr(n):
+    ret = []
+    for i in range(n):
+        ret.append('\033[{};38;5;{};48;2;{};{};{}mtext '.format(
+            (1, 4, 7)[i % 3], i % 256, i % 256, (i * 3) % 256, (i * 7) % 256))
+        ret.append('\033[m')
+    return ''.join(ret)
+
+
+def main():
+    for n in (1, 10, 100, 1000):
+        seq = long_mixed_sgr(n)
+        number = max(10, 10000 // n)
+        bench('parse {} sequences (cold)'.format(n),
+              lambda: (iroiro.colors._parse.cache_clear(), color(seq)),
+              number)
+        bench('parse {} sequences (memoized)'.format(n),
+              lambda: color(seq),
+              number)
+
+
+if __name__ == '__main__':
+    main()
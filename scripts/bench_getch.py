@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import pty
+import time
+import tty
+import threading
+
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import iroiro
+from iroiro import getch, KeyReader
+from iroiro.lib_tui import _decode_keys, key_table
+
+
+def old_getch(timeout=None, encoding='utf8'):
+    import termios, tty
+    import select
+
+    fd = sys.stdin.fileno()
+    orig_term_attr = termios.tcgetattr(fd)
+    when = termios.TCSADRAIN
+
+    def has_data(t=0):
+        return select.select([fd], [], [], t)[0]
+
+    try:
+        tty.setraw(fd, when=when)
+        if not has_data(timeout):
+            return None
+
+        acc = b''
+        candidate_matches = set(key_table.keys())
+        while True:
+            acc += os.read(fd, 1)
+            if not has_data():
+                break
+            if candidate_matches:
+                candidate_matches = set(key_seq for key_seq in candidate_matches if key_seq.startswith(acc))
+                if candidate_matches == {acc}:
+                    break
+                if candidate_matches:
+                    continue
+            try:
+                acc.decode(encoding)
+                break
+            except UnicodeError:
+                continue
+
+        if acc in key_table:
+            return key_table[acc]
+        try:
+            return acc.decode(encoding)
+        except UnicodeError:
+            return acc
+
+    finally:
+        termios.tcsetattr(fd, when, orig_term_attr)
+
+
+def bench(name, payload, consume):
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    stdin = sys.stdin
+    sys.stdin = open(slave, closefd=False)
+
+    writer = threading.Thread(target=os.write, args=(master, payload))
+    try:
+        t = time.perf_counter()
+        writer.start()
+        count = consume(slave)
+        t = time.perf_counter() - t
+    finally:
+        writer.join()
+        sys.stdin = stdin
+        os.close(master)
+        os.close(slave)
+
+    print('{:<40} {:>10.2f} ms {:>8} events'.format(name, t * 1e3, count))
+
+
+def getch_n(func, n):
+    def consume(fd):
+        for i in range(n):
+            func()
+        return n
+    return consume
+
+
+def reader_n(n):
+    def consume(fd):
+        reader = KeyReader(fd)
+        for i in range(n):
+            reader.get()
+        return n
+    return consume
+
+
+def main():
+    text = 'The quick brown fox 測試テスト\r' * 128
+    arrows = '\033[A\033[B\033[C\033[D' * 256
+    payload = (text + arrows).encode('utf8')
+    n = len(_decode_keys(payload, 'utf8')[0])
+    print('payload: {} bytes, {} keys'.format(len(payload), n))
+
+    bench('getch() (old, byte by byte)', payload, getch_n(old_getch, n))
+    bench('getch()', payload, getch_n(getch, n))
+    bench('KeyReader.get()', payload, reader_n(n))
+
+    pasted = b'\033[200~' + text.encode('utf8') + b'\033[201~'
+    bench('getch() paste (old)', pasted, getch_n(old_getch, n - 1024 + 2))
+    bench('getch() bracketed paste', pasted, getch_n(getch, 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+from os.path import dirname, abspath
+root = dirname(dirname(abspath(__file__)))
+
+
+# Measure with cached bytecode, as an installed package would have
+env = dict(os.environ, PYTHONDONTWRITEBYTECODE='', PYTHONPYCACHEPREFIX=tempfile.mkdtemp())
+
+
+def bench(name, code, number=20):
+    subprocess.run([sys.executable, '-c', code], cwd=root, env=env, check=True)
+    ts = []
+    for i in range(number):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=root, env=env, check=True)
+        ts.append(time.perf_counter() - t)
+    print('{:<40} {:>10.2f} ms'.format(name, min(ts) * 1e3))
+
+
+def main():
+    bench('python (baseline)', 'pass')
+    bench('import iroiro', 'import iroiro')
+    bench('iroiro.red', 'import iroiro; iroiro.red')
+    bench('iroiro.strwidth', 'import iroiro; iroiro.strwidth')
+    bench('iroiro.run', 'import iroiro; iroiro.run')
+    bench('from iroiro import * (eager)', 'from iroiro import *')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import threading
+
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from iroiro import command
+
+
+def sample_threads(peak, done):
+    while not done.wait(0.001):
+        peak[0] = max(peak[0], threading.active_count() - 1)
+
+
+def bench(engine, n, lines):
+    peak = [0]
+    done = threading.Event()
+    sampler = threading.Thread(target=sample_threads, args=(peak, done))
+    sampler.start()
+
+    # Children wait for stdin to close, so all of them are alive at the same time
+    procs = [command(['sh', '-c', 'cat; seq {}'.format(lines)], stdin=True, engine=engine).run(wait=False)
+             for i in range(n)]
+
+    t = time.perf_counter()
+    for p in procs:
+        p.stdin.close()
+    for p in procs:
+        p.wait()
+    t = time.perf_counter() - t
+
+    done.set()
+    sampler.join()
+    threads = peak[0]
+
+    assert all(len(p.stdout.lines) == lines for p in procs)
+    print('{:<10} {:>5} children {:>6} peak threads {:>10.2f} ms {:>12.0f} lines/s'.format(
+        engine, n, threads, t * 1e3, n * lines / t))
+
+
+def main():
+    lines = 2000
+    for n in (1, 10, 100, 500):
+        for engine in ('thread', 'selector'):
+            bench(engine, n, lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import sys
+import timeit
+import unicodedata
+
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import iroiro
+from iroiro import decolor, strwidth, ljust, orange, Table
+
+
+def bench(name, stmt, number):
+    t = min(timeit.repeat(stmt, number=number, repeat=5, globals=globals()))
+    print('{:<40} {:>10.2f} us'.format(name, t / number * 1e6))
+
+
+def old_charwidth(c):
+    import unicodedata
+    return 1 + (unicodedata.east_asian_width(c) in 'WF')
+
+
+def old_strwidth(s):
+    return sum(old_charwidth(c) for c in decolor(s))
+
+
+def cjk_table(rows, cols):
+    words = ('嗚啦呀哈', '測試', 'テスト', '한국어', 'ascii', orange('顏色'), '😂👍')
+    return [[words[(r * cols + c) % len(words)] * (1 + c % 3) + str(r) for c in range(cols)]
+            for r in range(rows)]
+
+
+def main():
+    table = cjk_table(100, 8)
+    cells = [cell for row in table for cell in row]
+    ascii_cells = [decolor(cell).encode('ascii', 'replace').decode() for cell in cells]
+
+    bench('strwidth() CJK cells (old)', lambda: [old_strwidth(c) for c in cells], 100)
+    bench('strwidth() CJK cells (cold)',
+          lambda: (iroiro.tui._strwidth.cache_clear(), [strwidth(c) for c in cells]),
+          100)
+    bench('strwidth() CJK cells (memoized)', lambda: [strwidth(c) for c in cells], 100)
+    bench('strwidth() ASCII cells (old)', lambda: [old_strwidth(c) for c in ascii_cells], 100)
+    bench('strwidth() ASCII cells', lambda: [strwidth(c) for c in ascii_cells], 100)
+
+    bench('ljust() CJK table (old)', lambda: ljust_old(table), 20)
+    bench('ljust() CJK table', lambda: ljust(table), 20)
+
+    report = cjk_table(10000, 4)
+    bench('ljust() 10k rows', lambda: ljust(report), 3)
+    bench('Table.render() 10k rows', lambda: Table(report).render(), 3)
+    bench('Table.stream() 10k rows, sample=100',
+          lambda: list(Table().stream(report, sample=100)), 3)
+
+
+def ljust_old(table):
+    lib_tui = sys.modules['iroiro.lib_tui']
+    orig = lib_tui.strwidth
+    lib_tui.strwidth = old_strwidth
+    try:
+        return ljust(table)
+    finally:
+        lib_tui.strwidth = orig
+
+
+if __name__ == '__main__':
+    main()
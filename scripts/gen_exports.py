@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# Generate iroiro/internal_exports.py, the index for lazy loading in iroiro/__init__.py
+
+import os
+import sys
+import importlib
+
+from os.path import dirname, abspath, join
+
+root = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, root)
+
+
+def module_names(prefix):
+    return sorted(
+            f[len(prefix):-3]
+            for f in os.listdir(join(root, 'iroiro'))
+            if f.startswith(prefix) and f.endswith('.py')
+            )
+
+
+def main():
+    lib_modules = module_names('lib_')
+    bin_modules = module_names('bin_')
+
+    exports = {}
+    for name in lib_modules:
+        module = importlib.import_module('iroiro.lib_' + name)
+        for attr in module.__all__:
+            exports[attr] = name
+
+    lines = []
+    lines.append('# Generated by scripts/gen_exports.py, do not edit')
+    lines.append('')
+    lines.append('lib_modules = (')
+    for name in lib_modules:
+        lines.append("        '{}',".format(name))
+    lines.append('        )')
+    lines.append('')
+    lines.append('bin_modules = (')
+    for name in bin_modules:
+        lines.append("        '{}',".format(name))
+    lines.append('        )')
+    lines.append('')
+    lines.append('# {attr: lib module}')
+    lines.append('exports = {')
+    for attr, name in exports.items():
+        lines.append("        '{}': '{}',".format(attr, name))
+    lines.append('        }')
+
+    with open(join(root, 'iroiro', 'internal_exports.py'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# Generate iroiro/internal_widths.py from the unicodedata of running Python
+
+import sys
+import unicodedata
+
+from os.path import dirname, abspath, join
+
+
+unassigned_wide = (
+        (0x3400, 0x4DBF),
+        (0x4E00, 0x9FFF),
+        (0xF900, 0xFAFF),
+        (0x20000, 0x2FFFD),
+        (0x30000, 0x3FFFD),
+        )
+
+
+def width(c):
+    o = ord(c)
+
+    # Soft hyphen is visible
+    if o == 0x00AD:
+        return 1
+
+    # Hangul Jamo medial vowels and final consonants are combined into previous char
+    if 0x1160 <= o <= 0x11FF or 0xD7B0 <= o <= 0xD7FF:
+        return 0
+
+    category = unicodedata.category(c)
+    if category in ('Mn', 'Me', 'Cf'):
+        return 0
+
+    # Unassigned code points are wide only in CJK blocks
+    if category == 'Cn':
+        return 1 + any(first <= o <= last for first, last in unassigned_wide)
+
+    return 1 + (unicodedata.east_asian_width(c) in 'WF')
+
+
+def main():
+    table = []
+    for o in range(sys.maxunicode + 1):
+        w = width(chr(o))
+        if table and table[-1][1] == o - 1 and table[-1][2] == w:
+            table[-1][1] = o
+        else:
+            table.append([o, o, w])
+
+    lines = []
+    lines.append('# Generated by scripts/gen_widths.py, do not edit')
+    lines.append('')
+    lines.append("unidata_version = '{}'".format(unicodedata.unidata_version))
+    lines.append('')
+    lines.append('# (first, last, width), ranges not listed here are width 1')
+    lines.append('width_table = (')
+    for first, last, w in table:
+        if w != 1:
+            lines.append('        (0x{:04X}, 0x{:04X}, {}),'.format(first, last, w))
+    lines.append('        )')
+
+    path = join(dirname(dirname(abspath(__file__))), 'iroiro', 'internal_widths.py')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()